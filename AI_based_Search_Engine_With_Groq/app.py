@@ -1,13 +1,136 @@
+import os
+import time
+
+import httpx
 import streamlit as st
 from langchain_groq import ChatGroq
-from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
 from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchRun
 from langchain.agents import initialize_agent, AgentType
+from langchain.callbacks import StreamlitCallbackHandler
 from dotenv import load_dotenv
 
+from conversation import ConversationWindow, llm_summarizer
+from pdf_cache import PdfCache, PdfPrefetcher
+from search_sources import (
+    ARXIV, SOURCES, WEB, WIKIPEDIA, ArxivLinksAPIWrapper, BackgroundFill, DuckDuckGoTimeoutAPIWrapper, ResultStore,
+    SourceTimeout, ToolObservationRecorder, WikipediaHttpAPIWrapper, split_pdf_links,
+)
+from stubs import stub_tools
+from tool_cache import CachedTool, ToolResultCache
+
 # Load environment variables
 load_dotenv()
 
+# ----------------- Search Result Cache -----------------
+# Tool outputs are shared across sessions and restarts; "stub" swaps in offline tools for testing
+SEARCH_TOOLS_BACKEND = os.getenv("SEARCH_TOOLS_BACKEND", "live")
+SEARCH_CACHE_PATH = os.getenv(
+    "SEARCH_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".search_cache", "results.sqlite")
+)
+SEARCH_CACHE_MB = int(os.getenv("SEARCH_CACHE_MB", "64"))
+SEARCH_CACHE_TTLS = {
+    ARXIV: float(os.getenv("SEARCH_CACHE_TTL_ARXIV", str(7 * 24 * 3600))),
+    WIKIPEDIA: float(os.getenv("SEARCH_CACHE_TTL_WIKIPEDIA", str(24 * 3600))),
+    WEB: float(os.getenv("SEARCH_CACHE_TTL_WEB", "3600")),
+}
+SEARCH_STUB_URL = os.getenv("SEARCH_STUB_URL")
+SOURCE_LABELS = {WIKIPEDIA: "Wikipedia", WEB: "DuckDuckGo", ARXIV: "Arxiv"}
+
+# ----------------- Deadlines -----------------
+# Per-source timeouts and an overall budget for the agent and the tabs; slow sources are shown as missing
+SOURCE_TIMEOUTS = {
+    ARXIV: float(os.getenv("SEARCH_TIMEOUT_ARXIV", "8")),
+    WIKIPEDIA: float(os.getenv("SEARCH_TIMEOUT_WIKIPEDIA", "6")),
+    WEB: float(os.getenv("SEARCH_TIMEOUT_WEB", "6")),
+}
+SEARCH_BUDGET = float(os.getenv("SEARCH_BUDGET", "25"))
+SEARCH_HEDGE_AFTER = float(os.getenv("SEARCH_HEDGE_AFTER", "0")) or None
+# Connect/read timeout of the search clients when Deadline Mode is off
+SEARCH_CLIENT_TIMEOUT = float(os.getenv("SEARCH_CLIENT_TIMEOUT", "30"))
+
+# ----------------- Arxiv PDFs -----------------
+# The top papers' PDFs stream into a disk cache while the answer is written, so downloading them is instant
+PDF_CACHE_DIR = os.getenv(
+    "PDF_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".search_cache", "pdfs")
+)
+PDF_CACHE_MB = int(os.getenv("PDF_CACHE_MB", "256"))
+PDF_PREFETCH_TOP = int(os.getenv("PDF_PREFETCH_TOP", "2"))
+# Seconds the page waits after the answer; slower PDFs are offered in the sidebar once they arrive
+PDF_WAIT = float(os.getenv("PDF_WAIT", "2"))
+
+
+@st.cache_resource
+def get_pdf_prefetcher():
+    return PdfPrefetcher(PdfCache(PDF_CACHE_DIR, max_bytes=PDF_CACHE_MB * 1024 * 1024))
+
+
+# ----------------- Conversation Window -----------------
+# The agent sees the newest messages verbatim within a token budget, and a summary of the rest
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "6"))
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "1500"))
+CHAT_SUMMARY_WORDS = int(os.getenv("CHAT_SUMMARY_WORDS", "150"))
+
+
+@st.cache_resource
+def get_tool_cache():
+    return ToolResultCache(SEARCH_CACHE_PATH, max_bytes=SEARCH_CACHE_MB * 1024 * 1024, ttls=SEARCH_CACHE_TTLS)
+
+
+# ----------------- Shared Clients -----------------
+# Built once per process (or per API key) and reused by every session and rerun
+GROQ_MODEL = "gemma2-9b-it"
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+
+
+@st.cache_resource
+def get_http_client():
+    # One keep-alive connection pool to the Groq API, so messages skip the TLS handshake
+    limits = httpx.Limits(max_connections=GROQ_POOL_SIZE, max_keepalive_connections=GROQ_POOL_SIZE, keepalive_expiry=120)
+    return httpx.Client(limits=limits, timeout=httpx.Timeout(60.0, connect=10.0))
+
+
+@st.cache_resource(max_entries=32)
+def get_llm(api_key):
+    return ChatGroq(groq_api_key=api_key, model=GROQ_MODEL, streaming=True, http_client=get_http_client())
+
+
+# Tools initialization
+@st.cache_resource
+def get_tools(deadlines=False):
+    # Every client gives up on its own, so an abandoned call frees its thread soon after its deadline
+    client_timeouts = SOURCE_TIMEOUTS if deadlines else dict.fromkeys(SOURCE_TIMEOUTS, SEARCH_CLIENT_TIMEOUT)
+    if SEARCH_TOOLS_BACKEND == "stub":
+        tools = stub_tools(base_url=SEARCH_STUB_URL, timeouts=client_timeouts)
+    else:
+        arxiv_wrapper = ArxivLinksAPIWrapper(top_k_results=5, doc_content_chars_max=500, timeout=client_timeouts[ARXIV])
+        wiki_wrapper = WikipediaHttpAPIWrapper(
+            top_k_results=5, doc_content_chars_max=500, timeout=client_timeouts[WIKIPEDIA]
+        )
+        web_wrapper = DuckDuckGoTimeoutAPIWrapper(timeout=client_timeouts[WEB])
+        tools = [
+            ArxivQueryRun(api_wrapper=arxiv_wrapper),
+            WikipediaQueryRun(api_wrapper=wiki_wrapper),
+            DuckDuckGoSearchRun(name=WEB, api_wrapper=web_wrapper)
+        ]
+    if not deadlines:
+        return [CachedTool.wrap(tool, get_tool_cache()) for tool in tools]
+    return [
+        CachedTool.wrap(tool, get_tool_cache(), timeout=SOURCE_TIMEOUTS[tool.name], hedge_after=SEARCH_HEDGE_AFTER)
+        for tool in tools
+    ]
+
+
+@st.cache_resource(max_entries=32)
+def get_search_agent(api_key, deadlines=False):
+    # The executor keeps no per-run state, so sessions with the same key can share it.
+    # With deadlines, it stops calling tools once the budget is spent and answers from what it has.
+    limits = {"max_execution_time": SEARCH_BUDGET, "early_stopping_method": "generate"} if deadlines else {}
+    return initialize_agent(
+        get_tools(deadlines), get_llm(api_key), agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        handle_parsing_errors=True, **limits
+    )
+
+
 # ----------------- Page Configuration -----------------
 st.set_page_config(
     page_title="Smart AI Search Engine",
@@ -234,6 +357,96 @@ def split_into_points(text, min_points=5):
         points += ["N/A"] * (min_points - len(points))
     return points[:max(len(points), min_points)]
 
+# ----------------- Helper: Render one source's tab -----------------
+def render_source(source, results, prompt):
+    # Wikipedia - Tab 1
+    if source == WIKIPEDIA:
+        st.subheader("🧠 Wikipedia Result")
+        try:
+            wiki_result = results.text(WIKIPEDIA)
+            points = split_into_points(wiki_result, 5)
+            st.markdown(f"""
+            <div class="card card-wiki">
+                <h3>🧠 Wikipedia Key Points</h3>
+                {"<br>".join([f"• {p}" for p in points])}
+                <br><a href="https://en.wikipedia.org/wiki/{prompt.replace(' ','_')}" target="_blank">🔗 Read full article</a>
+            </div>
+            """, unsafe_allow_html=True)
+        except SourceTimeout as e:
+            st.warning(f"⏱️ Wikipedia missed the deadline ({e}).")
+        except Exception as e:
+            st.error(f"Error fetching Wikipedia: {str(e)}")
+
+    # DuckDuckGo - Tab 2
+    elif source == WEB:
+        st.subheader("🌐 DuckDuckGo Result")
+        try:
+            duck_result = results.text(WEB)
+            points = split_into_points(duck_result, 5)
+            st.markdown(f"""
+            <div class="card card-duck">
+                <h3>🌐 Web Search Key Points</h3>
+                {"<br>".join([f"• {p}" for p in points])}
+            </div>
+            """, unsafe_allow_html=True)
+        except SourceTimeout as e:
+            st.warning(f"⏱️ DuckDuckGo missed the deadline ({e}).")
+        except Exception as e:
+            st.error(f"Error fetching DuckDuckGo: {str(e)}")
+
+    # Arxiv - Tab 3
+    elif source == ARXIV:
+        st.subheader("📚 Arxiv Result")
+        try:
+            arxiv_results, pdf_urls = split_pdf_links(results.text(ARXIV))
+            points = split_into_points(arxiv_results, 5)
+            st.markdown(f"""
+            <div class="card card-arxiv">
+                <h3>📚 Arxiv Key Points</h3>
+                {"<br>".join([f"• {p}" for p in points])}
+                <br><a href="https://arxiv.org/search/?query={prompt.replace(' ','+')}" target="_blank">🔗 View on Arxiv</a>
+            </div>
+            """, unsafe_allow_html=True)
+
+            # PDFs of the top results (listed by ArxivLinksAPIWrapper) download in the background;
+            # their buttons are filled in by show_pdf_downloads once the answer is done
+            pdf_urls = pdf_urls[:PDF_PREFETCH_TOP]
+            get_pdf_prefetcher().prefetch(pdf_urls)
+            pending_pdfs = []
+            for pdf_url in pdf_urls:
+                pdf_slot = st.empty()
+                pdf_slot.caption(f"⏳ Fetching {pdf_url.rsplit('/', 1)[-1]}.pdf...")
+                pending_pdfs.append((pdf_slot, pdf_url))
+            return pending_pdfs
+
+        except SourceTimeout as e:
+            st.warning(f"⏱️ Arxiv missed the deadline ({e}).")
+        except Exception as e:
+            st.error(f"Error fetching Arxiv: {str(e)}")
+
+# ----------------- Helper: Arxiv PDF downloads -----------------
+def show_pdf_downloads(pending_pdfs, timeout):
+    # Serves the prefetched bytes; a PDF that is not ready in time is offered as a link instead,
+    # and listed for the sidebar, which shows its download button on a later rerun
+    deadline = time.monotonic() + timeout
+    late_pdfs = []
+    for pdf_slot, pdf_url in pending_pdfs:
+        name = pdf_url.rsplit("/", 1)[-1]
+        try:
+            data = get_pdf_prefetcher().result(pdf_url, max(0.0, deadline - time.monotonic()))
+        except Exception:
+            pdf_slot.link_button(f"🔗 Open Arxiv PDF ({name})", pdf_url)
+            late_pdfs.append(pdf_url)
+            continue
+        pdf_slot.download_button(
+            label=f"📥 Download Arxiv PDF ({name})",
+            data=data,
+            file_name=f"{name}.pdf",
+            mime="application/pdf",
+            key=f"pdf-{pdf_url}"
+        )
+    st.session_state.late_pdfs = late_pdfs
+
 # ----------------- Main App -----------------
 if st.session_state.api_valid:
 
@@ -242,6 +455,7 @@ if st.session_state.api_valid:
     # Clear chat
     if st.sidebar.button("🧹 Clear Chat History"):
         st.session_state.messages = []
+        st.session_state.pop("conversation", None)
         st.experimental_rerun()
 
     if "messages" not in st.session_state:
@@ -249,20 +463,28 @@ if st.session_state.api_valid:
             {"role": "assistant", "content": "Hi! I'm your smart search assistant 🤖. Ask me anything!"}
         ]
 
+    # Render whatever sources answer within the budget instead of waiting on the slowest one
+    deadline_mode = st.sidebar.checkbox(
+        "⏱️ Deadline Mode", value=os.getenv("SEARCH_DEADLINES", "1") == "1",
+        help=f"Answer within {SEARCH_BUDGET:g}s and show sources that miss their timeout as missing.",
+    )
+
+    # Tool results per question, shared by the agent and the tabs
+    if "search_results" not in st.session_state:
+        st.session_state.search_results = ResultStore()
+
+    # Running summary of older turns, updated only when turns leave the window
+    if "conversation" not in st.session_state:
+        st.session_state.conversation = ConversationWindow(
+            None, max_messages=CHAT_HISTORY_MESSAGES, budget=CHAT_HISTORY_TOKENS
+        )
+    conversation = st.session_state.conversation
+    conversation.summarize = llm_summarizer(get_llm(api_key_input), CHAT_SUMMARY_WORDS)
+
     # Display chat messages
     for msg in st.session_state.messages:
         st.chat_message(msg["role"]).write(msg["content"])
 
-    # Tools initialization
-    def get_tools():
-        arxiv_wrapper = ArxivAPIWrapper(top_k_results=5, doc_content_chars_max=500)
-        wiki_wrapper = WikipediaAPIWrapper(top_k_results=5, doc_content_chars_max=500)
-        return [
-            ArxivQueryRun(api_wrapper=arxiv_wrapper),
-            WikipediaQueryRun(api_wrapper=wiki_wrapper),
-            DuckDuckGoSearchRun(name="Web Search")
-        ]
-
     # Chat input
     prompt = st.chat_input("💬 Type your question here...")
     if prompt:
@@ -270,84 +492,96 @@ if st.session_state.api_valid:
         st.chat_message("user").write(prompt)
 
         try:
-            llm = ChatGroq(groq_api_key=api_key_input, model="gemma2-9b-it", streaming=True)
-            tools = get_tools()
-            search_agent = initialize_agent(tools, llm, agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION, handle_parsing_errors=True)
-            response = search_agent.run(st.session_state.messages)
-            st.session_state.messages.append({"role": "assistant", "content": response})
-
-            # ----------------- Tabs -----------------
-            tab1, tab2, tab3 = st.tabs(["🧠 Wikipedia", "🌐 DuckDuckGo", "📚 Arxiv"])
-
-            # Wikipedia - Tab 1
-            with tab1:
-                st.subheader("🧠 Wikipedia Result")
-                try:
-                    wiki_result = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper(top_k_results=5, doc_content_chars_max=500)).run(prompt)
-                    points = split_into_points(wiki_result, 5)
-                    st.markdown(f"""
-                    <div class="card card-wiki">
-                        <h3>🧠 Wikipedia Key Points</h3>
-                        {"<br>".join([f"• {p}" for p in points])}
-                        <br><a href="https://en.wikipedia.org/wiki/{prompt.replace(' ','_')}" target="_blank">🔗 Read full article</a>
-                    </div>
-                    """, unsafe_allow_html=True)
-                except Exception as e:
-                    st.error(f"Error fetching Wikipedia: {str(e)}")
-
-            # DuckDuckGo - Tab 2
-            with tab2:
-                st.subheader("🌐 DuckDuckGo Result")
-                try:
-                    duck_result = DuckDuckGoSearchRun(name="Web Search").run(prompt)
-                    points = split_into_points(duck_result, 5)
-                    st.markdown(f"""
-                    <div class="card card-duck">
-                        <h3>🌐 Web Search Key Points</h3>
-                        {"<br>".join([f"• {p}" for p in points])}
-                    </div>
-                    """, unsafe_allow_html=True)
-                except Exception as e:
-                    st.error(f"Error fetching DuckDuckGo: {str(e)}")
-
-            # Arxiv - Tab 3
-            with tab3:
-                st.subheader("📚 Arxiv Result")
-                try:
-                    arxiv_query = ArxivQueryRun(api_wrapper=ArxivAPIWrapper(top_k_results=5, doc_content_chars_max=500))
-                    arxiv_results = arxiv_query.run(prompt)
-                    points = split_into_points(arxiv_results, 5)
-                    st.markdown(f"""
-                    <div class="card card-arxiv">
-                        <h3>📚 Arxiv Key Points</h3>
-                        {"<br>".join([f"• {p}" for p in points])}
-                        <br><a href="https://arxiv.org/search/?query={prompt.replace(' ','+')}" target="_blank">🔗 View on Arxiv</a>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                    # PDF download
-                    try:
-                        arxiv_wrapper = ArxivAPIWrapper(top_k_results=1)
-                        metadata = arxiv_wrapper.arxiv_search(prompt)
-                        if metadata and 'pdf_url' in metadata[0]:
-                            pdf_url = metadata[0]['pdf_url']
-                            st.download_button(
-                                label="📥 Download Arxiv PDF",
-                                data=f"{pdf_url}",
-                                file_name=f"{prompt.replace(' ','_')}.pdf",
-                                mime="application/pdf"
-                            )
-                    except:
-                        pass
-
-                except Exception as e:
-                    st.error(f"Error fetching Arxiv: {str(e)}")
+            search_agent = get_search_agent(api_key_input, deadline_mode)
+            # The tabs reuse what the agent looked up; sources it skipped are fetched concurrently
+            results = st.session_state.search_results.get(prompt)
+            agent_input = conversation.build(st.session_state.messages)
+            # The search budget starts after any summary update, so that call does not eat into it
+            started = time.monotonic()
+
+            # Tool calls and answer tokens stream into the message; the tabs below fill in as sources arrive
+            with st.chat_message("assistant"):
+                streamlit_callback = StreamlitCallbackHandler(st.container())
+                answer_slot = st.empty()
+            late_notice = st.empty()
+            tabs = dict(zip(SOURCES, st.tabs(["🧠 Wikipedia", "🌐 DuckDuckGo", "📚 Arxiv"])))
+            slots = {source: tab.empty() for source, tab in tabs.items()}
+            for source, slot in slots.items():
+                slot.caption(f"⏳ Waiting for {SOURCE_LABELS[source]}...")
+            shown = set()
+            pending_pdfs = []
+
+            def show_source(source):
+                shown.add(source)
+                with slots[source].container():
+                    pending_pdfs.extend(render_source(source, results, prompt) or [])
+
+            def show_remaining():
+                for source in SOURCES:
+                    if source not in shown:
+                        show_source(source)
+                with results.lock:
+                    late = list(results.late)
+                if late:
+                    missed = ", ".join(SOURCE_LABELS[source] for source in late)
+                    late_notice.caption(f"⏱️ Not in time: {missed}. Ask again to retry them.")
+
+            if deadline_mode:
+                fill_args = (SOURCE_TIMEOUTS, started + SEARCH_BUDGET, SEARCH_HEDGE_AFTER)
+            else:
+                fill_args = ()
+            # A repeated question may already have some sources on hand
+            for source in SOURCES:
+                if source in results.observations:
+                    show_source(source)
+            background_fill = BackgroundFill(results, get_tools(deadline_mode), *fill_args, on_done=show_remaining)
+            try:
+                response = search_agent.run(agent_input, callbacks=[
+                    streamlit_callback, ToolObservationRecorder(results, on_result=show_source), background_fill,
+                ])
+                st.session_state.messages.append({"role": "assistant", "content": response})
+                answer_slot.write(response)
+            finally:
+                # Missing sources and PDF downloads are shown even if the agent failed
+                background_fill.finish()
+                show_pdf_downloads(pending_pdfs, PDF_WAIT)
 
         except Exception as e:
             error_msg = f"⚠️ An error occurred: {str(e)}"
             st.session_state.messages.append({"role": "assistant", "content": error_msg})
             st.error(error_msg)
 
+    # Search cache counters (shared by all sessions since the server started)
+    tool_cache = get_tool_cache()
+    with st.sidebar.expander("🗄️ Search Cache"):
+        for source, label in SOURCE_LABELS.items():
+            counts = tool_cache.stats.get(source, {"hits": 0, "misses": 0})
+            st.write(f"{label}: {counts['hits']} hits / {counts['misses']} misses")
+        st.caption(f"Hit rate {tool_cache.hit_rate():.0%} · {len(tool_cache)} results · {tool_cache.total_bytes() / 1e6:.1f} MB")
+        pdf_prefetcher = get_pdf_prefetcher()
+        pdf_stats = pdf_prefetcher.stats
+        st.write(f"Arxiv PDFs: {pdf_stats['hits']} hits / {pdf_stats['downloads']} downloads / {pdf_stats['errors']} failed")
+        st.caption(f"{len(pdf_prefetcher.cache)} PDFs · {pdf_prefetcher.cache.total_bytes() / 1e6:.1f} MB")
+
+    # PDFs of the last answer that were still downloading when it was shown
+    if st.session_state.get("late_pdfs"):
+        with st.sidebar.expander("📥 Arxiv PDFs", expanded=True):
+            for pdf_url in st.session_state.late_pdfs:
+                name = pdf_url.rsplit("/", 1)[-1]
+                data = get_pdf_prefetcher().cache.get(pdf_url)
+                if data is None:
+                    st.caption(f"⏳ {name}.pdf is still downloading; it appears here on the next rerun.")
+                    continue
+                st.download_button(
+                    label=f"📥 {name}.pdf", data=data, file_name=f"{name}.pdf", mime="application/pdf",
+                    key=f"late-pdf-{pdf_url}"
+                )
+
+    if conversation.summary:
+        with st.sidebar.expander("🧠 Conversation Memory"):
+            st.caption(f"{conversation.folded} earlier messages, summarised")
+            st.write(conversation.summary)
+
 else:
     st.markdown("""
     <div style="text-align:center; margin-top:50px;">
@@ -0,0 +1,121 @@
+import hashlib
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_ROLES = {"user": "User", "assistant": "Assistant"}
+
+SUMMARY_PROMPT = """You keep a running summary of a research conversation between a user and a search assistant.
+Update the summary with the new messages below. Keep the topics, named papers, people, facts and open
+questions the user may refer back to; drop greetings and filler. Answer with the updated summary only,
+in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+"""
+
+
+def _transcript(messages):
+    return "\n".join(f"{_ROLES.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+
+class TokenCounter:
+    """cl100k token counts when tiktoken and its tables are available, else a character estimate."""
+
+    def __init__(self):
+        try:
+            self._encoding = tiktoken.get_encoding("cl100k_base") if tiktoken else None
+        except Exception:
+            self._encoding = None  # tiktoken downloads its tables on first use
+
+    def __call__(self, text):
+        if self._encoding is None:
+            return len(text) // 3 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+def llm_summarizer(llm, max_words=150):
+    """``summarize(summary, messages) -> summary`` backed by a chat model."""
+
+    def summarize(summary, messages):
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(empty)", transcript=_transcript(messages))
+        return llm.invoke(prompt).content.strip()
+
+    return summarize
+
+
+# ------------------------------
+# 🧠 Token-budgeted conversation window
+# ------------------------------
+class ConversationWindow:
+    """Builds the agent's input from the chat history within a token budget.
+
+    The newest messages are passed verbatim, at most ``max_messages`` of them
+    and ``budget`` tokens including the question. Anything older is folded
+    into a running summary. The summary is updated only when messages leave
+    the window, and only with those messages, so each message is summarised
+    once; the window is then cut to half its limits, so that happens every
+    few turns. Keep one instance per chat in session state.
+    """
+
+    def __init__(self, summarize, count_tokens=None, max_messages=6, budget=1500):
+        self.summarize = summarize
+        self.count_tokens = count_tokens or TokenCounter()
+        self.max_messages = max_messages
+        self.budget = budget
+        self.summary = ""
+        self.folded = 0           # history[:folded] is covered by the summary
+        self._folded_digest = ""  # detects a cleared or edited history
+
+    @staticmethod
+    def _digest(messages):
+        return hashlib.sha1(_transcript(messages).encode("utf-8")).hexdigest()
+
+    def reset(self):
+        self.summary, self.folded, self._folded_digest = "", 0, ""
+
+    def build(self, messages):
+        """Agent input for ``messages``, whose last entry is the user's new question."""
+        *history, question = messages
+        if len(history) < self.folded or self._digest(history[: self.folded]) != self._folded_digest:
+            self.reset()
+
+        used = self.count_tokens(question["content"]) + self.count_tokens(self.summary)
+        start = self._window_start(history, used, self.max_messages, self.budget)
+        if start > self.folded:
+            # Cut back to half the limits, so the summary is updated every few turns rather than on each one
+            fold_to = self._window_start(history, used, self.max_messages // 2, used + (self.budget - used) // 2)
+            try:
+                self.summary = self.summarize(self.summary, history[self.folded:fold_to])
+            except Exception:
+                pass  # keep the old summary and the full-size window; these messages are folded on a later turn
+            else:
+                self.folded = start = fold_to
+                self._folded_digest = self._digest(history[:fold_to])
+
+        return self._render(history[start:], question["content"])
+
+    def _window_start(self, history, used, max_messages, budget):
+        start = len(history)
+        while start > self.folded and len(history) - start < max_messages:
+            used += self.count_tokens(history[start - 1]["content"]) + 2
+            if used > budget:
+                break
+            start -= 1
+        return start
+
+    def _render(self, recent, question):
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        if recent:
+            parts.append(f"Recent conversation:\n{_transcript(recent)}")
+        if not parts:
+            return question
+        parts.append(f"Current question: {question}")
+        return "\n\n".join(parts)
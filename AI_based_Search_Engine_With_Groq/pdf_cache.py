@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+_PDF_MAGIC = b"%PDF"
+
+
+class PdfTooLarge(Exception):
+    pass
+
+
+# ------------------------------
+# 📄 Bounded on-disk PDF cache
+# ------------------------------
+class PdfCache:
+    """PDFs on disk, one file per URL, bounded to ``max_bytes`` with LRU eviction.
+
+    Downloads are streamed in ``chunk_size`` pieces to a temporary file and
+    renamed into place when complete, so a reader never sees a partial PDF.
+    Safe to share between Streamlit sessions and threads.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, max_file_bytes=50 * 1024 * 1024, chunk_size=64 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".pdf")
+
+    def get(self, url):
+        """The cached bytes for ``url``, or ``None``."""
+        path = self.path(url)
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return None
+            os.utime(path)  # mtime is the LRU clock
+        return data
+
+    def download(self, url, client):
+        """Stream ``url`` into the cache with ``client`` and return its bytes."""
+        path = self.path(url)
+        part = f"{path}.{threading.get_ident()}.part"
+        size = 0
+        try:
+            with client.stream("GET", url) as response:
+                response.raise_for_status()
+                with open(part, "wb") as f:
+                    for chunk in response.iter_bytes(self.chunk_size):
+                        size += len(chunk)
+                        if size > self.max_file_bytes:
+                            raise PdfTooLarge(f"{url} is over {self.max_file_bytes / 1e6:.0f} MB")
+                        f.write(chunk)
+            with open(part, "rb") as f:
+                data = f.read()
+            if not data.startswith(_PDF_MAGIC):
+                raise ValueError(f"{url} did not return a PDF")
+            with self._lock:
+                os.replace(part, path)
+                self._evict()
+            return data
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for _, size, _ in self._entries())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries())
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed since the scan
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries[:-1]:  # never the file just written
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+# ------------------------------
+# 🚚 Background prefetcher
+# ------------------------------
+class PdfPrefetcher:
+    """Downloads PDFs into a ``PdfCache`` on background threads.
+
+    ``prefetch`` returns at once; ``result`` waits for a download that is
+    already running instead of starting a second one. ``stats`` counts
+    ``hits`` (already cached), ``downloads`` and ``errors`` since the process
+    started.
+    """
+
+    def __init__(self, cache, client=None, max_workers=4):
+        self.cache = cache
+        self.client = client or httpx.Client(follow_redirects=True, timeout=httpx.Timeout(30.0, connect=10.0))
+        self.stats = {"hits": 0, "downloads": 0, "errors": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf")
+        self._running = {}  # url -> future
+        self._lock = threading.Lock()
+
+    def prefetch(self, urls):
+        for url in urls:
+            self._submit(url)
+
+    def _submit(self, url):
+        with self._lock:
+            future = self._running.get(url)
+            if future is None:
+                future = self._running[url] = self._pool.submit(self._fetch, url)
+            return future
+
+    def _fetch(self, url):
+        outcome = "errors"
+        try:
+            data = self.cache.get(url)
+            if data is not None:
+                outcome = "hits"
+            else:
+                data = self.cache.download(url, self.client)
+                outcome = "downloads"
+            return data
+        finally:
+            with self._lock:
+                self.stats[outcome] += 1
+                self._running.pop(url, None)
+
+    def result(self, url, timeout=None):
+        """The PDF's bytes, waiting up to ``timeout`` seconds for its download.
+
+        Raises ``concurrent.futures.TimeoutError`` if it is still running,
+        or whatever the download raised.
+        """
+        data = self.cache.get(url)
+        if data is not None:
+            return data
+        return self._submit(url).result(timeout)
@@ -0,0 +1,469 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+import httpx
+import requests
+from langchain_community.utilities import ArxivAPIWrapper, DuckDuckGoSearchAPIWrapper, WikipediaAPIWrapper
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Tool names, as the agent and the callbacks see them
+ARXIV = "arxiv"
+WIKIPEDIA = "wikipedia"
+WEB = "Web Search"
+SOURCES = [WIKIPEDIA, WEB, ARXIV]
+
+_PDF_LINE = re.compile(r"^PDF: (\S+)\n?", re.MULTILINE)
+
+# Calls per source that may run at once, hedges included. A source at its cap
+# gets no hedge, and new calls to it fail fast instead of queueing.
+MAX_IN_FLIGHT = 4
+
+# Source calls run here rather than on asyncio's default executor: asyncio.run()
+# joins that executor on exit, which would make a hung request block the page.
+# It has a thread for every call the caps allow, so hung calls cannot fill it.
+_POOL = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT * len(SOURCES), thread_name_prefix="search")
+
+_TIMEOUT_PREFIX = "No answer from "
+
+# What a ReAct agent writes before its answer
+_FINAL_ANSWER = "Final Answer:"
+
+# How long BackgroundFill.finish() waits past the deadline for fill_missing to file its results
+_FILL_GRACE = 0.5
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+# ------------------------------
+# 📚 Arxiv results with PDF links
+# ------------------------------
+class ArxivLinksAPIWrapper(ArxivAPIWrapper):
+    """``ArxivAPIWrapper`` that also lists each paper's PDF link.
+
+    The link sits right under the title so it survives ``doc_content_chars_max``
+    truncation, and the Arxiv tab can offer the PDF without a second lookup.
+    With a ``timeout``, each HTTP request gets that connect/read timeout and
+    is not retried, and a timed-out search raises ``SourceTimeout``.
+    """
+
+    timeout: Optional[float] = None
+
+    def _fetch_results(self, query):
+        if self.timeout is None:
+            return super()._fetch_results(query)
+        import arxiv
+
+        timeout = self.timeout
+
+        class TimeoutAdapter(requests.adapters.HTTPAdapter):
+            def send(self, request, **kwargs):
+                kwargs["timeout"] = kwargs.get("timeout") or timeout
+                return super().send(request, **kwargs)
+
+        # A client per search: arxiv.Client paces its own requests and is not meant to be shared between threads
+        client = arxiv.Client(num_retries=0)
+        client._session.mount("https://", TimeoutAdapter())
+        client._session.mount("http://", TimeoutAdapter())
+        if self.is_arxiv_identifier(query):
+            search = self.arxiv_search(id_list=query.split(), max_results=self.top_k_results)
+        else:
+            search = self.arxiv_search(query[: self.ARXIV_MAX_QUERY_LENGTH], max_results=self.top_k_results)
+        return client.results(search)
+
+    def run(self, query):
+        try:
+            results = list(self._fetch_results(query))
+        except requests.Timeout as ex:
+            raise SourceTimeout(f"arxiv: {ex}") from ex
+        except self.arxiv_exceptions as ex:
+            return f"Arxiv exception: {ex}"
+        docs = [
+            f"Published: {result.updated.date()}\n"
+            f"Title: {result.title}\n"
+            f"PDF: {result.pdf_url}\n"
+            f"Authors: {', '.join(a.name for a in result.authors)}\n"
+            f"Summary: {result.summary}"
+            for result in results
+        ]
+        if docs:
+            return "\n\n".join(docs)[: self.doc_content_chars_max]
+        return "No good Arxiv Result was found"
+
+
+class WikipediaHttpAPIWrapper(WikipediaAPIWrapper):
+    """``WikipediaAPIWrapper`` that asks the MediaWiki API directly, with a timeout.
+
+    The ``wikipedia`` package takes no timeout and makes a request per page;
+    this gets the top pages' intros in one request with ``timeout`` seconds
+    to connect and read, and raises ``SourceTimeout`` when it runs out.
+    Output is formatted like ``WikipediaAPIWrapper.run``.
+    """
+
+    timeout: float = 10.0
+
+    def run(self, query):
+        params = {
+            "action": "query", "format": "json", "formatversion": 2, "redirects": 1,
+            "generator": "search", "gsrsearch": query[:300], "gsrlimit": self.top_k_results,
+            "prop": "extracts", "exintro": 1, "explaintext": 1, "exlimit": "max",
+        }
+        try:
+            response = httpx.get(
+                f"https://{self.lang}.wikipedia.org/w/api.php", params=params, timeout=self.timeout,
+                headers={"User-Agent": "smart-ai-search-engine/1.0"},
+            )
+        except httpx.TimeoutException as ex:
+            raise SourceTimeout(f"wikipedia: {ex}") from ex
+        response.raise_for_status()
+        pages = sorted(response.json().get("query", {}).get("pages", []), key=lambda page: page.get("index", 0))
+        summaries = [f"Page: {page['title']}\nSummary: {page.get('extract', '')}" for page in pages]
+        if not summaries:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(summaries)[: self.doc_content_chars_max]
+
+
+class DuckDuckGoTimeoutAPIWrapper(DuckDuckGoSearchAPIWrapper):
+    """``DuckDuckGoSearchAPIWrapper`` whose ddgs client waits ``timeout`` seconds, raising ``SourceTimeout``."""
+
+    timeout: float = 10.0
+
+    def _ddgs_text(self, query, max_results=None):
+        from ddgs import DDGS
+        from ddgs.exceptions import TimeoutException
+
+        try:
+            with DDGS(timeout=self.timeout) as ddgs:
+                results = ddgs.text(
+                    query, region=self.region, safesearch=self.safesearch, timelimit=self.time,
+                    max_results=max_results or self.max_results, backend=self.backend,
+                )
+                return list(results or [])
+        except TimeoutException as ex:
+            raise SourceTimeout(f"{WEB}: {ex}") from ex
+
+
+def split_pdf_links(text):
+    """``(text without the PDF lines, [pdf urls])`` for an ``ArxivLinksAPIWrapper`` result."""
+    return _PDF_LINE.sub("", text), _PDF_LINE.findall(text)
+
+
+# ------------------------------
+# ⏱️ Deadlines and hedged requests
+# ------------------------------
+class _InFlight:
+    """Running calls per source, refused past ``limit``."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, source):
+        with self._lock:
+            if self._counts.get(source, 0) >= self.limit:
+                return False
+            self._counts[source] = self._counts.get(source, 0) + 1
+            return True
+
+    def release(self, source):
+        with self._lock:
+            self._counts[source] -= 1
+
+
+_IN_FLIGHT = _InFlight(MAX_IN_FLIGHT)
+
+
+def _call_and_release(source, fn, arg):
+    try:
+        return fn(arg)
+    finally:
+        _IN_FLIGHT.release(source)
+
+
+def _start(source, fn, arg):
+    # The source's slot is freed when the call returns, not when a caller stops waiting for it
+    if not _IN_FLIGHT.acquire(source):
+        return None
+    future = _POOL.submit(_call_and_release, source, fn, arg)
+    future.add_done_callback(lambda f: f.cancelled() and _IN_FLIGHT.release(source))
+    return asyncio.wrap_future(future)
+
+
+async def hedged(fn, arg, source, timeout=None, hedge_after=None):
+    """``fn(arg)`` on the search pool, raising ``asyncio.TimeoutError`` after ``timeout`` seconds.
+
+    If no answer has arrived after ``hedge_after`` seconds, an identical second
+    request is started and whichever succeeds first wins. This cuts the tail
+    when one upstream request stalls. A request that is abandoned keeps running
+    in the pool until its client times out, and its result is dropped. Calls
+    count against ``source``'s ``MAX_IN_FLIGHT``: at the cap the hedge is
+    skipped, and a new call raises ``SourceTimeout`` at once.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = _start(source, fn, arg)
+    if first is None:
+        raise SourceTimeout(f"{MAX_IN_FLIGHT} earlier calls to {source} are still running")
+    attempts = [first]
+    hedge_at = start + hedge_after if hedge_after else None
+    deadline = start + timeout if timeout else None
+    error = None
+    try:
+        pending = {first}
+        while pending:
+            wake = min((t for t in (hedge_at, deadline) if t is not None), default=None)
+            done, pending = await asyncio.wait(
+                pending, timeout=None if wake is None else max(0.0, wake - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+                error = attempt.exception()
+            now = loop.time()
+            if deadline is not None and now >= deadline:
+                break
+            if hedge_at is not None and now >= hedge_at:
+                hedge = _start(source, fn, arg)
+                if hedge is not None:
+                    attempts.append(hedge)
+                    pending.add(hedge)
+                hedge_at = None
+        if error is not None and not pending:
+            raise error
+        raise asyncio.TimeoutError()
+    finally:
+        # Also when our caller is cancelled: a call still queued gives its slot back now
+        for attempt in attempts:
+            if not attempt.done():
+                attempt.cancel()
+
+
+# ------------------------------
+# 🗂️ Per-query result store
+# ------------------------------
+class SourceError(Exception):
+    pass
+
+
+class SourceTimeout(SourceError):
+    """A source that did not answer in time, from a deadline, a client timeout or a full source."""
+
+
+def timeout_message(source, seconds):
+    """Observation the agent gets when a source misses its deadline."""
+    return f"{_TIMEOUT_PREFIX}{source} within {seconds:g}s; continue with the other sources."
+
+
+class SearchResults:
+    """What each source returned for one question.
+
+    The agent's own tool observations are filed first (``ToolObservationRecorder``);
+    ``fill_missing`` then fetches only the sources the agent didn't call.
+    Both may write from different threads, so writers hold ``lock``.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.observations = {}  # source -> text
+        self.errors = {}        # source -> message
+        self.late = {}          # source -> seconds it was given before we stopped waiting
+        self.retried = set()    # failed sources already fetched a second time
+        self.lock = threading.Lock()
+
+    def missing(self):
+        """Sources with nothing to show yet, including ones that missed an earlier deadline
+        and ones that failed but have not been retried (errors are often transient)."""
+        with self.lock:
+            return [
+                source for source in SOURCES
+                if source not in self.observations and (source not in self.errors or source not in self.retried)
+            ]
+
+    def text(self, source):
+        """The source's result; ``SourceTimeout`` if it missed its deadline, ``SourceError`` if it failed."""
+        with self.lock:
+            if source in self.late:
+                raise SourceTimeout(f"no answer within {self.late[source]:g}s")
+            if source in self.errors:
+                raise SourceError(self.errors[source])
+            return self.observations[source]
+
+
+class ToolObservationRecorder(BaseCallbackHandler):
+    """Agent callback that files each tool's first observation into a ``SearchResults``.
+
+    ``on_result(source)`` is called when a source's observation is filed, so
+    its tab can render while the agent is still working.
+    """
+
+    def __init__(self, results, on_result=None):
+        self.results = results
+        self.on_result = on_result
+        self._running = {}  # run id -> tool name
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._running[run_id] = (serialized or {}).get("name") or kwargs.get("name")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        name = self._running.pop(run_id, None)
+        text = str(getattr(output, "content", output))
+        if name not in SOURCES or text.startswith(_TIMEOUT_PREFIX):
+            return
+        with self.results.lock:
+            if name in self.results.observations:
+                return
+            self.results.observations[name] = text
+        if self.on_result:
+            self.on_result(name)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._running.pop(run_id, None)
+
+
+async def _fetch_all(tools, query, sources, timeouts, budget, hedge_after):
+    by_name = {tool.name: tool for tool in tools}
+    tasks = {
+        # ``lookup`` skips a CachedTool's own time limit, since the deadline is enforced here
+        source: asyncio.ensure_future(hedged(
+            getattr(by_name[source], "lookup", by_name[source].invoke), query, source, timeouts.get(source), hedge_after,
+        ))
+        for source in sources
+    }
+    done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+    for task in pending:
+        task.cancel()
+    outcomes = {}
+    for source, task in tasks.items():
+        if task in pending:
+            outcomes[source] = asyncio.TimeoutError()
+        else:
+            outcomes[source] = task.exception() or task.result()
+    return outcomes
+
+
+def fill_missing(results, tools, timeouts=None, deadline=None, hedge_after=None):
+    """Fetch every source the agent didn't touch, all at once, into ``results``.
+
+    ``timeouts`` caps each source (``{source: seconds}``) and ``deadline`` (a
+    ``time.monotonic()`` value) caps them all together. Sources still running
+    when either passes are filed under ``results.late`` instead of waited for;
+    without either, a client timeout is filed as an error. ``hedge_after`` starts a second request for any source still silent after
+    that many seconds.
+    """
+    missing = results.missing()
+    if not missing:
+        return results
+    with results.lock:
+        results.retried.update(source for source in missing if source in results.errors)
+    timeouts = timeouts or {}
+    # Cached sources answer in milliseconds, so let them through even when the budget is spent
+    budget = None if deadline is None else max(0.2, deadline - time.monotonic())
+    outcomes = asyncio.run(_fetch_all(tools, results.query, missing, timeouts, budget, hedge_after))
+    with results.lock:
+        for source, outcome in outcomes.items():
+            results.late.pop(source, None)
+            results.errors.pop(source, None)
+            allowed = [t for t in (timeouts.get(source), budget) if t is not None]
+            if isinstance(outcome, (asyncio.TimeoutError, SourceTimeout)) and allowed:
+                results.late[source] = min(allowed)
+            elif isinstance(outcome, Exception):
+                # With no limit of ours, a timeout came from the client itself and is reported as it is
+                results.errors[source] = str(outcome) or type(outcome).__name__
+                results.errors[source] = str(outcome)
+            else:
+                results.observations[source] = outcome
+    return results
+
+
+class BackgroundFill(BaseCallbackHandler):
+    """Agent callback that runs ``fill_missing`` on its own thread while the answer streams.
+
+    The fetch starts once the agent begins writing its final answer, when
+    it will call no more tools. It gets a thread of its own, so it never
+    waits behind the source calls it starts on the search pool. ``on_done()``
+    is called from the agent's thread on the first streamed token after the
+    fetch has finished, or by ``finish()`` after the run, whichever comes
+    first.
+    """
+
+    def __init__(self, results, tools, timeouts=None, deadline=None, hedge_after=None, on_done=None):
+        self.results = results
+        self.tools = tools
+        self.timeouts = timeouts
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.on_done = on_done
+        self._future = None
+        self._reported = False
+        self._text = ""
+
+    def start(self):
+        if self._future is None:
+            self._future = Future()
+            threading.Thread(target=self._fill, name="search-fill", daemon=True).start()
+
+    def _fill(self):
+        try:
+            self._future.set_result(fill_missing(self.results, self.tools, self.timeouts, self.deadline, self.hedge_after))
+        except BaseException as ex:
+            self._future.set_exception(ex)
+
+    def finish(self):
+        """Wait for the fetch (starting it if the agent never answered) until the deadline, then report it.
+
+        Sources still missing at the deadline are filed as late; a result that
+        arrives afterwards is kept for the next time the question is asked.
+        """
+        self.start()
+        timeout = None if self.deadline is None else max(0.0, self.deadline - time.monotonic()) + _FILL_GRACE
+        try:
+            self._future.result(timeout)
+        except FutureTimeoutError:
+            with self.results.lock:
+                for source in SOURCES:
+                    if source not in self.results.observations and source not in self.results.errors:
+                        self.results.late.setdefault(source, self.timeouts.get(source, 0) if self.timeouts else 0)
+        self._report()
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            if self.on_done:
+                self.on_done()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._text = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self._future is None:
+            self._text += token
+            if _FINAL_ANSWER in self._text:
+                self.start()
+        elif self._future.done():
+            self._report()
+
+
+class ResultStore:
+    """``SearchResults`` of the last ``max_queries`` questions, kept in session state
+    so reruns and repeated questions reuse them."""
+
+    def __init__(self, max_queries=20):
+        self.max_queries = max_queries
+        self._results = OrderedDict()
+
+    def get(self, query):
+        key = normalize_query(query)
+        results = self._results.pop(key, None) or SearchResults(query)
+        self._results[key] = results
+        while len(self._results) > self.max_queries:
+            self._results.popitem(last=False)
+        return results
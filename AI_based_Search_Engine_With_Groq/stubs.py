@@ -0,0 +1,231 @@
+"""Offline stand-ins for the Arxiv, Wikipedia and DuckDuckGo tools.
+
+Set ``SEARCH_TOOLS_BACKEND=stub`` to run the app (and its result cache)
+without network access. Results are deterministic per query.
+
+To exercise timeouts and hedging over real sockets, start a delayed stub server
+
+    python stubs.py --port 8766 --delay "Web Search=12" --delay arxiv=3 --stall-rate 0.2 --stall 10
+
+and set ``SEARCH_STUB_URL=http://127.0.0.1:8766`` as well.
+"""
+import argparse
+import hashlib
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.tools import BaseTool
+
+from search_sources import ARXIV, WEB, WIKIPEDIA, SourceTimeout
+
+
+def _digest(query):
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+
+
+def stub_result(source, query, count=3, pdf_base="https://arxiv.org/pdf"):
+    """Text shaped like the real wrapper's output for ``source``."""
+    tag = _digest(query)
+    if source == ARXIV:
+        return "\n\n".join(
+            f"Published: 2024-01-0{i + 1}\n"
+            f"Title: A study of {query} ({tag}.{i})\n"
+            f"PDF: {pdf_base}/2401.{tag[:5]}v{i + 1}\n"
+            f"Authors: A. Author, B. Author\n"
+            f"Summary: We examine {query}. Our method improves on prior work. Results are reported on three benchmarks."
+            for i in range(count)
+        )
+    if source == WIKIPEDIA:
+        return "\n\n".join(
+            f"Page: {query.title()} {i}\nSummary: {query} is a topic ({tag}). It has a history. It is studied widely."
+            for i in range(count)
+        )
+    return " ".join(f"Result {i} for {query} ({tag}). Snippet text from a web page." for i in range(count))
+
+
+def stub_pdf(name, size):
+    """``size`` bytes that start like a PDF."""
+    header = f"%PDF-1.4\n% stub paper {name}\n".encode("utf-8")
+    return header + b"0" * max(0, size - len(header))
+
+
+class StubSearchTool(BaseTool):
+    """Returns ``stub_result`` after ``latency`` seconds and counts its calls."""
+
+    latency: float = 0.0
+    calls: int = 0
+
+    def _run(self, query, run_manager=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return stub_result(self.name, query)
+
+
+class HttpStubSearchTool(BaseTool):
+    """Fetches ``stub_result`` from a ``StubSearchServer``, so delays happen on a real socket.
+
+    Like the live wrappers, it gives up after ``timeout`` seconds with ``SourceTimeout``.
+    """
+
+    base_url: str
+    timeout: float = 120.0
+    calls: int = 0
+
+    def _run(self, query, run_manager=None):
+        self.calls += 1
+        url = f"{self.base_url}/{urllib.parse.quote(self.name)}?q={urllib.parse.quote(query)}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return response.read().decode("utf-8")
+        except socket.timeout as ex:
+            raise SourceTimeout(f"{self.name}: {ex}") from ex
+        except urllib.error.URLError as ex:
+            if isinstance(ex.reason, socket.timeout):
+                raise SourceTimeout(f"{self.name}: {ex.reason}") from ex
+            raise
+
+
+_DESCRIPTIONS = {
+    ARXIV: "Search Arxiv papers (offline stub).",
+    WIKIPEDIA: "Search Wikipedia (offline stub).",
+    WEB: "Search the web (offline stub).",
+}
+
+
+def stub_tools(latency=0.0, base_url=None, timeouts=None):
+    """In-process stub tools, or HTTP ones talking to a ``StubSearchServer`` at ``base_url``.
+
+    ``timeouts`` gives the HTTP tools a client timeout per source, like the live wrappers.
+    """
+    if base_url:
+        timeouts = timeouts or {}
+        return [
+            HttpStubSearchTool(name=name, description=text, base_url=base_url, timeout=timeouts.get(name, 120.0))
+            for name, text in _DESCRIPTIONS.items()
+        ]
+    return [StubSearchTool(name=name, description=text, latency=latency) for name, text in _DESCRIPTIONS.items()]
+
+
+# ------------------------------
+# 🐢 Delayed stub server
+# ------------------------------
+class StubSearchServer:
+    """Local HTTP server answering ``GET /<source>?q=...`` with ``stub_result``.
+
+    Arxiv results link to ``GET /pdf/<id>`` on the same server, which sends a
+    ``pdf_bytes`` long stand-in PDF after ``delays["pdf"]`` seconds.
+
+    Each source waits ``delays[source]`` seconds plus up to ``jitter`` random
+    seconds before answering, and a ``stall_rate`` fraction of requests stall
+    for ``stall`` seconds more (the tail that hedged requests cut). A negative
+    delay never answers within a request's lifetime (a hung upstream).
+    ``hits`` counts requests per source.
+    """
+
+    def __init__(self, port=0, delays=None, jitter=0.0, stall_rate=0.0, stall=0.0, seed=0, pdf_bytes=1_000_000):
+        self.delays = dict(delays or {})
+        self.pdf_bytes = pdf_bytes
+        self.jitter = jitter
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.hits = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                source = urllib.parse.unquote(url.path.lstrip("/"))
+                query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+                if source.startswith("pdf/"):
+                    return self.send_pdf(source[len("pdf/"):])
+                with server._lock:
+                    server.hits[source] = server.hits.get(source, 0) + 1
+                    delay = server.delays.get(source, 0.0)
+                    if delay < 0:
+                        delay = 3600.0
+                    else:
+                        delay += server._rng.uniform(0, server.jitter)
+                        if server._rng.random() < server.stall_rate:
+                            delay += server.stall
+                time.sleep(delay)
+                body = stub_result(source, query, pdf_base=f"{server.base_url}/pdf").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_pdf(self, name):
+                with server._lock:
+                    server.hits["pdf"] = server.hits.get("pdf", 0) + 1
+                time.sleep(server.delays.get("pdf", 0.0))
+                body = stub_pdf(name, server.pdf_bytes)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _parse_delay(text):
+    source, _, seconds = text.rpartition("=")
+    return source, float(seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--delay", type=_parse_delay, action="append", default=[],
+                        help="SOURCE=SECONDS, e.g. 'Web Search=12'; a negative value hangs")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay, up to this many seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument("--stall", type=float, default=10.0, help="seconds a stalled request waits")
+    parser.add_argument("--pdf-bytes", type=int, default=1_000_000, help="size of the stand-in Arxiv PDFs")
+    args = parser.parse_args()
+    server = StubSearchServer(
+        args.port, dict(args.delay), args.jitter, args.stall_rate, args.stall, pdf_bytes=args.pdf_bytes
+    )
+    print(f"Stub search server on {server.base_url} (delays {server.delays or 'none'})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.tools import BaseTool
+
+from search_sources import ARXIV, WEB, WIKIPEDIA, SourceTimeout, hedged, normalize_query, timeout_message
+
+# Papers change rarely, encyclopedia pages daily, web results hourly
+DEFAULT_TTLS = {ARXIV: 7 * 24 * 3600, WIKIPEDIA: 24 * 3600, WEB: 3600}
+
+# Wrapper settings that change what a query returns, so they belong in the key
+_KEY_PARAMS = ("top_k_results", "doc_content_chars_max", "max_results", "region", "safesearch", "time", "source", "lang")
+
+# Outputs that report a failure rather than a result are not cached
+_ERROR_PREFIXES = ("Arxiv exception:",)
+
+
+# ------------------------------
+# 🗄️ SQLite TTL + LRU store
+# ------------------------------
+class ToolResultCache:
+    """Search tool outputs on disk, expiring per source and bounded to ``max_bytes`` with LRU eviction.
+
+    Safe to share between Streamlit sessions and threads. ``stats`` holds
+    ``{source: {"hits": n, "misses": n}}`` since the process started.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttls=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, source TEXT NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(source, query, params=None):
+        payload = json.dumps([source, normalize_query(query), params or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, source, outcome):
+        counts = self.stats.setdefault(source, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def get(self, source, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttls.get(source, 0):
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(source, "hits" if row is not None else "misses")
+        return row[0] if row is not None else None
+
+    def set(self, source, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, source, value, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, source, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def hit_rate(self, source=None):
+        counts = list(self.stats.values()) if source is None else [self.stats.get(source, {"hits": 0, "misses": 0})]
+        hits = sum(c["hits"] for c in counts)
+        total = hits + sum(c["misses"] for c in counts)
+        return hits / total if total else 0.0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM results WHERE key = ?", victims)
+
+
+# ------------------------------
+# 🧰 Cached tool wrapper
+# ------------------------------
+def tool_params(tool):
+    """The settings of ``tool``'s API wrapper that affect its output."""
+    wrapper = getattr(tool, "api_wrapper", None)
+    params = {"wrapper": type(wrapper).__name__} if wrapper is not None else {}
+    for name in _KEY_PARAMS:
+        value = getattr(wrapper, name, None)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+class CachedTool(BaseTool):
+    """Looks each query up in a ``ToolResultCache`` before calling the wrapped tool.
+
+    Keeps the wrapped tool's name and description, so the agent and
+    ``ToolObservationRecorder`` see no difference. With a ``timeout``, a call
+    that runs too long gives the agent a short "no answer" observation
+    instead of stalling it (``hedge_after`` as in ``search_sources.hedged``),
+    and so does a client timeout in the wrapped tool.
+    """
+
+    tool: Any
+    cache: Any
+    params: dict = {}
+    timeout: Optional[float] = None
+    hedge_after: Optional[float] = None
+
+    @classmethod
+    def wrap(cls, tool, cache, timeout=None, hedge_after=None):
+        return cls(
+            name=tool.name, description=tool.description, tool=tool, cache=cache, params=tool_params(tool),
+            timeout=timeout, hedge_after=hedge_after,
+        )
+
+    def _run(self, query, run_manager=None):
+        try:
+            if not self.timeout and not self.hedge_after:
+                return self.lookup(query)
+            return asyncio.run(hedged(self.lookup, query, self.name, self.timeout, self.hedge_after))
+        except (asyncio.TimeoutError, SourceTimeout):
+            return timeout_message(self.name, self.timeout or 0)
+
+    def lookup(self, query):
+        """Cached result, else the wrapped tool's, with no time limit."""
+        key = self.cache.key(self.name, query, self.params)
+        cached = self.cache.get(self.name, key)
+        if cached is not None:
+            return cached
+        result = self.tool.run(query)
+        if isinstance(result, str) and not result.startswith(_ERROR_PREFIXES):
+            self.cache.set(self.name, key, result)
+        return result
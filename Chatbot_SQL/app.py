@@ -1,3 +1,5 @@
+import os
+import httpx
 import streamlit as st
 from pathlib import Path
 from urllib.parse import quote_plus
@@ -36,12 +38,22 @@ if radio_option == MYSQLDB:
 else:
     db_url = LOCALDB
 
-# LLM setup
-llm = ChatGroq(
-    groq_api_key=api_key,
-    model_name="llama-3.3-70b-versatile",
-    streaming=True
-)
+# Shared Groq client: one keep-alive connection pool per process, one ChatGroq per API key
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+
+@st.cache_resource
+def get_http_client():
+    limits = httpx.Limits(max_connections=GROQ_POOL_SIZE, max_keepalive_connections=GROQ_POOL_SIZE, keepalive_expiry=120)
+    return httpx.Client(limits=limits, timeout=httpx.Timeout(60.0, connect=10.0))
+
+@st.cache_resource(max_entries=32)
+def get_llm(api_key):
+    return ChatGroq(
+        groq_api_key=api_key,
+        model_name="llama-3.3-70b-versatile",
+        streaming=True,
+        http_client=get_http_client(),
+    )
 
 # Database configuration
 @st.cache_resource(ttl="2h")
@@ -73,16 +85,22 @@ def configure_db(db_url, mysql_host=None, mysql_user=None, mysql_password=None,
         st.error(f"Database connection failed: {e}")
         st.stop()
 
-# Initialize database
-db = configure_db(db_url, mysql_host, mysql_user, mysql_password, mysql_db) if db_url == MYSQLDB else configure_db(db_url)
-
-# Agent setup
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-agent = create_sql_agent(
-    llm=llm,
-    toolkit=toolkit,
-    verbose=True,
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+# Agent setup, built once per API key and database (SQLDatabase reflects the schema when created)
+@st.cache_resource(ttl="2h", max_entries=32)
+def get_agent(api_key, db_url, mysql_host=None, mysql_user=None, mysql_password=None, mysql_db=None):
+    db = configure_db(db_url, mysql_host, mysql_user, mysql_password, mysql_db) if db_url == MYSQLDB else configure_db(db_url)
+    llm = get_llm(api_key)
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+    return create_sql_agent(
+        llm=llm,
+        toolkit=toolkit,
+        verbose=True,
+        agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+    )
+
+agent = (
+    get_agent(api_key, db_url, mysql_host, mysql_user, mysql_password, mysql_db)
+    if db_url == MYSQLDB else get_agent(api_key, db_url)
 )
 
 # Chat history
@@ -0,0 +1,130 @@
+import math
+
+import faiss
+import numpy as np
+
+# ------------------------------
+# 🧭 Selectable FAISS index types
+# ------------------------------
+FLAT = "Flat (exact)"
+HNSW = "HNSW"
+IVF_PQ = "IVF-PQ"
+SQ8 = "SQ8 (int8)"
+FP16 = "Float16"
+INDEX_TYPES = [FLAT, HNSW, IVF_PQ, SQ8, FP16]
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 128
+IVF_MIN_TRAIN = 10_000  # PQ wants ~39 x 256 training points; below that stay flat (exact)
+IVF_NPROBE = 16
+TRAIN_SAMPLE = 100_000  # k-means on more rows than this costs time without improving centroids
+
+
+def ivf_nlist(n):
+    return min(4096, max(16, int(math.sqrt(n))))
+
+
+def pq_subquantizers(d):
+    # PQ needs m to divide d; 64 sub-quantizers of 8 bits = 64 bytes per vector
+    return next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if d % m == 0)
+
+
+def index_kind(index):
+    """Which of INDEX_TYPES an existing faiss index is."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(index, faiss.IndexIVF):
+        return IVF_PQ
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return FP16 if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else SQ8
+    return FLAT
+
+
+def build_index(index_type, vectors):
+    """Build a trained, populated index of ``index_type`` over ``vectors`` (n x d float32)."""
+    n, d = vectors.shape
+    if index_type == HNSW:
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type == IVF_PQ and n >= IVF_MIN_TRAIN:
+        index = faiss.index_factory(d, f"IVF{ivf_nlist(n)},PQ{pq_subquantizers(d)}x8")
+    elif index_type == SQ8:
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+    elif index_type == FP16:
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16)
+    else:
+        index = faiss.IndexFlatL2(d)
+    if not index.is_trained:
+        if n > TRAIN_SAMPLE:
+            sample = np.random.default_rng(0).choice(n, TRAIN_SAMPLE, replace=False)
+            index.train(vectors[sample])
+        else:
+            index.train(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = IVF_NPROBE
+    index.add(vectors)
+    return index
+
+
+def reconstruct_all(index):
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def wants_rebuild(index, index_type):
+    """True if ``index`` should be rebuilt to match ``index_type`` at its current size."""
+    current = index_kind(index)
+    if index_type == IVF_PQ:
+        if index.ntotal < IVF_MIN_TRAIN:
+            return current != FLAT
+        if current != IVF_PQ:
+            return True
+        # Retrain once the corpus has outgrown the coarse quantizer
+        return ivf_nlist(index.ntotal) >= 4 * faiss.extract_index_ivf(index).nlist
+    return current != index_type
+
+
+def convert(vector_store, index_type):
+    """Swap ``vector_store.index`` for ``index_type`` if needed. Row order is kept,
+    so ``index_to_docstore_id`` stays valid. Returns True if the index changed.
+
+    Vectors are reconstructed from the current index, so converting away from
+    a lossy type (PQ, SQ8) carries its quantisation error along.
+    """
+    index = vector_store.index
+    if index.ntotal == 0 or not wants_rebuild(index, index_type):
+        return False
+    vector_store.index = build_index(index_type, reconstruct_all(index))
+    return True
+
+
+def delete(vector_store, ids):
+    """Delete documents by id for any index type.
+
+    Flat and scalar-quantised indexes compact on ``remove_ids`` the way
+    LangChain's ``FAISS.delete`` expects. HNSW cannot remove vectors and IVF
+    keeps the old row labels, so those are rebuilt from the remaining rows,
+    reusing the trained quantizers.
+    """
+    if index_kind(vector_store.index) in (FLAT, SQ8, FP16):
+        vector_store.delete(ids)
+        return
+    doomed = set(ids)
+    kept_rows = [row for row, doc_id in sorted(vector_store.index_to_docstore_id.items()) if doc_id not in doomed]
+    vectors = reconstruct_all(vector_store.index)[kept_rows]
+    fresh = faiss.clone_index(vector_store.index)
+    fresh.reset()
+    if len(vectors):
+        fresh.add(vectors)
+    vector_store.index = fresh
+    vector_store.docstore.delete(list(doomed))
+    vector_store.index_to_docstore_id = {
+        i: vector_store.index_to_docstore_id[row] for i, row in enumerate(kept_rows)
+    }
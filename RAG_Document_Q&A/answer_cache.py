@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _normalize_question(text):
+    return " ".join(text.lower().split())
+
+
+# ------------------------------
+# 💡 Semantic answer cache
+# ------------------------------
+class SemanticAnswerCache:
+    """Caches ``(answer, context docs)`` per index fingerprint.
+
+    A question hits the cache if it matches a stored one exactly (after case
+    and whitespace normalisation) or if the cosine similarity of their
+    embeddings is at least ``threshold``. Entries expire after ``ttl`` seconds
+    and the least recently used ones are evicted beyond ``max_entries``.
+    Safe to share between Streamlit sessions.
+    """
+
+    def __init__(self, max_entries=1000, ttl=24 * 3600, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (scope, normalised question) -> entry
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now):
+        stale = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in stale:
+            del self._entries[key]
+
+    def lookup(self, scope, question, vector):
+        """Return the cached entry dict (``answer``, ``context``, ``question``, ``similarity``) or None."""
+        now = time.time()
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            self._expire(now)
+            key = (scope, _normalize_question(question))
+            entry = self._entries.get(key)
+            similarity = 1.0
+            if entry is None:
+                candidates = [(k, e) for k, e in self._entries.items() if k[0] == scope]
+                if candidates:
+                    matrix = np.stack([e["vector"] for _, e in candidates])
+                    sims = matrix @ query
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        key, entry = candidates[best]
+                        similarity = float(sims[best])
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "context": entry["context"],
+                "similarity": similarity,
+            }
+
+    def store(self, scope, question, vector, answer, context):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            key = (scope, _normalize_question(question))
+            self._entries[key] = {
+                "question": question,
+                "vector": vector,
+                "answer": answer,
+                "context": list(context),
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
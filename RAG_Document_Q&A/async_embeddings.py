@@ -0,0 +1,210 @@
+import asyncio
+import os
+import random
+import re
+import threading
+
+import httpx
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+
+# ------------------------------
+# ⏱️ Rate-limit header parsing
+# ------------------------------
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value):
+    # Accepts "1.5", "20ms", "6m0s" (the formats used by retry-after / x-ratelimit-reset-*)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parts = _DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SCALE[unit] for amount, unit in parts)
+
+
+def retry_delay(headers):
+    """Seconds the server asked us to wait, or None if it gave no hint."""
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if name in headers:
+            delay = _parse_duration(headers[name])
+            if delay is not None:
+                return delay
+    return None
+
+
+# ------------------------------
+# 🚦 Adaptive concurrency limit
+# ------------------------------
+class AdaptiveLimiter:
+    """Semaphore whose limit halves on rate limiting and grows back by one per success."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + 1)
+
+    def on_throttle(self):
+        self.limit = max(1, self.limit // 2)
+
+
+# ------------------------------
+# 🧠 Batched async embeddings client
+# ------------------------------
+class AsyncBatchEmbeddings(Embeddings):
+    """OpenAI-compatible embeddings client that packs texts into token-budgeted
+    batches and keeps up to ``max_concurrency`` requests in flight.
+
+    ``base_url`` can point at any server speaking the ``/embeddings`` API,
+    including the local stub in ``stubs.py``.
+    """
+
+    def __init__(
+        self,
+        model="text-embedding-3-large",
+        api_key=None,
+        base_url=None,
+        batch_tokens=50_000,
+        batch_size=256,
+        max_concurrency=4,
+        max_retries=6,
+        timeout=60.0,
+    ):
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.throttled = 0
+        self._encoding = load_encoding(model)
+
+    def count_tokens(self, text):
+        if self._encoding is None:
+            # ~4 characters per token for English prose; errs towards smaller batches
+            return len(text) // 3 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def make_batches(self, texts):
+        """Group text indices so each batch stays under both the token and input-count budget."""
+        batches, current, current_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.batch_tokens or len(current) >= self.batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _post(self, client, limiter, inputs):
+        for attempt in range(self.max_retries + 1):
+            async with limiter:
+                response = await client.post(
+                    f"{self.base_url}/embeddings",
+                    json={"model": self.model, "input": inputs},
+                )
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                if response.status_code == 429:
+                    self.throttled += 1
+                    limiter.on_throttle()
+                delay = retry_delay(response.headers)
+                if delay is None:
+                    delay = min(30.0, 0.5 * 2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+                continue
+            response.raise_for_status()
+            limiter.on_success()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in data]
+
+    async def aembed_documents(self, texts):
+        if not texts:
+            return []
+        limiter = AdaptiveLimiter(self.max_concurrency)
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=self.timeout) as client:
+            batches = self.make_batches(texts)
+            results = await asyncio.gather(
+                *(self._post(client, limiter, [texts[i] for i in batch]) for batch in batches)
+            )
+        vectors = [None] * len(texts)
+        for batch, embeddings in zip(batches, results):
+            for i, vector in zip(batch, embeddings):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts):
+        return _run(self.aembed_documents(texts))
+
+    def embed_query(self, text):
+        return _run(self.aembed_query(text))
+
+
+def load_encoding(model):
+    # tiktoken downloads its BPE tables on first use; offline we fall back to an estimate
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+
+def _run(coro):
+    # Streamlit's script thread has no event loop; fall back to a helper thread if one is running
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
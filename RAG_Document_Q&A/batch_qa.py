@@ -0,0 +1,199 @@
+"""Answer a JSONL file of questions against an index saved by the app.
+
+    python batch_qa.py questions.jsonl answers.jsonl --concurrency 8
+
+Each input line is ``{"question": "...", "id": ...}`` (``id`` optional). The
+index is opened once, all questions are embedded in batches and searched in a
+single FAISS call, and Groq is called with at most ``--concurrency`` requests
+in flight. Answers are appended to the output as they finish, one JSON object
+per line with the question, answer and sources.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_community.vectorstores import FAISS
+from langchain_groq import ChatGroq
+
+from async_embeddings import AsyncBatchEmbeddings
+from context_packing import TokenCounter, pack_context
+from dedup import provenance
+from embedding_backends import BACKENDS, OPENAI, load_embeddings
+from index_store import IndexStore
+from pipeline import HYBRID, MMR, RAG_PROMPT, RETRIEVAL_MODES
+from retrieval import BM25Index, dense_search_batch, fuse_with_bm25, mmr_search_batch
+from stubs import stub_chat_model
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rag_cache", "indexes")
+
+
+def read_questions(path):
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            record.setdefault("id", number)
+            questions.append(record)
+    return questions
+
+
+def open_index(store, name, embeddings):
+    index, docstore, index_to_docstore_id, files, bm25, _ = store.open(name)
+    vector_store = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    if bm25 is None:
+        bm25 = BM25Index.from_docstore(docstore, index_to_docstore_id)
+    return vector_store, bm25
+
+
+def make_embeddings(args, info):
+    backend = args.embeddings or info.get("embedding_backend", OPENAI)
+    if backend == OPENAI:
+        embeddings = AsyncBatchEmbeddings(model=info.get("embedding_model", "text-embedding-3-large"))
+        model_name = embeddings.model
+    else:
+        embeddings = load_embeddings(backend, args.model_path or info.get("embedding_model_path"))
+        model_name = embeddings.model_name
+    expected = info.get("embedding_model")
+    if expected and expected != model_name:
+        sys.exit(f"Index was built with {expected!r} but the selected embeddings are {model_name!r}.")
+    return embeddings
+
+
+def make_llm(args):
+    if args.llm == "stub":
+        return stub_chat_model()
+    return ChatGroq(model=args.model, temperature=args.temperature, max_retries=args.max_retries)
+
+
+# ------------------------------
+# 🔎 Batched retrieval
+# ------------------------------
+def retrieve_all(questions, vector_store, bm25, embeddings, args):
+    """Context documents for every question: one embedding pass and one FAISS search for the whole set."""
+    texts = [q["question"] for q in questions]
+    vectors = embeddings.embed_documents(texts)
+    fetch_k = max(args.fetch_k, args.k) if args.mode == HYBRID else args.k
+    if args.mode == MMR:
+        dense = mmr_search_batch(vector_store, vectors, args.k, args.fetch_k, args.mmr_lambda)
+    else:
+        dense = dense_search_batch(vector_store, vectors, fetch_k)
+    count_tokens = TokenCounter()
+    docstore = vector_store.docstore
+    contexts = []
+    for text, ids in zip(texts, dense):
+        if args.mode == HYBRID:
+            ids = fuse_with_bm25(ids, bm25, text, args.k, fetch_k)
+        docs = [doc for doc in (docstore.search(doc_id) for doc_id in ids[: args.k]) if not isinstance(doc, str)]
+        contexts.append(pack_context(docs, args.context_tokens, count_tokens))
+    return contexts
+
+
+# ------------------------------
+# 🤖 Bounded-concurrency generation
+# ------------------------------
+async def answer_all(chain, questions, contexts, concurrency, on_result):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def answer(question, docs):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                text = await chain.ainvoke({"input": question["question"], "context": docs})
+                error = None
+            except Exception as e:
+                text, error = None, f"{type(e).__name__}: {e}"
+            return question, docs, text, error, time.perf_counter() - start
+
+    tasks = [asyncio.create_task(answer(q, docs)) for q, docs in zip(questions, contexts)]
+    for task in asyncio.as_completed(tasks):
+        on_result(*(await task))
+
+
+def sources(docs):
+    return [
+        {"source": entry["source"], "page": entry["page"]}
+        for doc in docs
+        for entry in provenance(doc.metadata)
+    ]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="input JSONL, one {\"question\": ...} per line")
+    parser.add_argument("output", help="output JSONL (appended to as answers arrive)")
+    parser.add_argument("--store", default=os.getenv("RAG_INDEX_STORE_DIR", DEFAULT_STORE), help="index store directory")
+    parser.add_argument("--index", help="saved index name (default: the most recently saved)")
+    parser.add_argument("--embeddings", choices=BACKENDS, help="default: the backend the index was built with")
+    parser.add_argument("--model-path", help="local embedding model directory")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default=HYBRID)
+    parser.add_argument("--k", type=int, default=int(os.getenv("RAG_RETRIEVAL_K", "4")))
+    parser.add_argument("--fetch-k", type=int, default=int(os.getenv("RAG_RETRIEVAL_FETCH_K", "20")),
+                        help="candidates per retriever before hybrid fusion or MMR")
+    parser.add_argument("--mmr-lambda", type=float, default=float(os.getenv("RAG_MMR_LAMBDA", "0.5")),
+                        help="MMR relevance (1) vs. diversity (0)")
+    parser.add_argument("--context-tokens", type=int, default=int(os.getenv("RAG_CONTEXT_TOKENS", "3000")))
+    parser.add_argument("--llm", choices=["groq", "stub"], default="groq")
+    parser.add_argument("--model", default="llama3-8b-8192")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--max-retries", type=int, default=6, help="Groq client retries (rate limits, 5xx)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Groq requests in flight")
+    args = parser.parse_args()
+
+    store = IndexStore(args.store)
+    name = args.index or next(iter(store.names()), None)
+    if name is None or not store.exists(name):
+        sys.exit(f"No saved index {'named ' + repr(name) if name else 'found'} in {args.store}")
+    info = store.info(name)
+    embeddings = make_embeddings(args, info)
+    vector_store, bm25 = open_index(store, name, embeddings)
+    questions = read_questions(args.questions)
+
+    start = time.perf_counter()
+    contexts = retrieve_all(questions, vector_store, bm25, embeddings, args)
+    retrieval_s = time.perf_counter() - start
+    print(f"Retrieved context for {len(questions)} questions in {retrieval_s:.2f}s (index {name})", file=sys.stderr)
+
+    chain = create_stuff_documents_chain(llm=make_llm(args), prompt=RAG_PROMPT)
+    done, failed = 0, 0
+    with open(args.output, "a", encoding="utf-8") as out:
+
+        def on_result(question, docs, text, error, latency):
+            nonlocal done, failed
+            done += 1
+            failed += error is not None
+            record = {
+                "id": question["id"],
+                "question": question["question"],
+                "answer": text,
+                "sources": sources(docs),
+                "latency_ms": round(latency * 1000, 1),
+            }
+            if error:
+                record["error"] = error
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if done % 100 == 0:
+                print(f"  {done}/{len(questions)} answered", file=sys.stderr)
+
+        asyncio.run(answer_all(chain, questions, contexts, args.concurrency, on_result))
+
+    total_s = time.perf_counter() - start
+    print(
+        f"Answered {done - failed}/{len(questions)} ({failed} failed) in {total_s:.1f}s "
+        f"· {len(questions) / total_s:.1f} questions/sec -> {args.output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
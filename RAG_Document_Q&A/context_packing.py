@@ -0,0 +1,119 @@
+import re
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from async_embeddings import load_encoding
+
+_WORD = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """cl100k token counts (close to Llama 3's tokenizer); a char estimate when offline."""
+
+    def __init__(self, model="gpt-4"):
+        self._encoding = load_encoding(model)
+
+    def __call__(self, text):
+        if self._encoding is None:
+            return len(text) // 3 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        if self._encoding is None:
+            return text[: max(0, (max_tokens - 1) * 3)]
+        return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+# ------------------------------
+# 🧩 Merge overlapping neighbours
+# ------------------------------
+def _overlap_merge(left, right, probe=40):
+    """If ``right`` starts inside the tail of ``left`` (splitter overlap), return the joined text."""
+    head = right[:probe]
+    if len(head) < probe:
+        return None
+    start = left.find(head)
+    while start != -1:
+        if right.startswith(left[start:]):
+            return left + right[len(left) - start:]
+        start = left.find(head, start + 1)
+    return None
+
+
+def merge_neighbours(docs):
+    """Join chunks from the same page whose text overlaps, keeping the best rank of the pair."""
+    merged = []
+    for doc in docs:
+        text = doc.page_content
+        for i, kept in enumerate(merged):
+            if kept.metadata.get("source") != doc.metadata.get("source") or kept.metadata.get("page") != doc.metadata.get("page"):
+                continue
+            joined = _overlap_merge(kept.page_content, text) or _overlap_merge(text, kept.page_content)
+            if joined:
+                merged[i] = Document(page_content=joined, metadata=dict(kept.metadata))
+                break
+        else:
+            merged.append(doc)
+    return merged
+
+
+# ------------------------------
+# 🧹 Near-duplicate removal
+# ------------------------------
+def _shingles(text, n=5):
+    words = _WORD.findall(text.lower())
+    if len(words) <= n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def drop_near_duplicates(docs, threshold=0.8):
+    """Keep the first (most relevant) of any group of chunks whose 5-word shingle Jaccard >= threshold."""
+    kept, kept_shingles = [], []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(shingles)
+    return kept
+
+
+# ------------------------------
+# 📦 Token budget
+# ------------------------------
+def fit_budget(docs, budget, count_tokens, min_tail_tokens=64):
+    """Take docs in relevance order until ``budget`` tokens; the last one may be truncated."""
+    packed, used = [], 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= budget:
+            packed.append(doc)
+            used += tokens
+            continue
+        remaining = budget - used
+        if remaining >= min_tail_tokens and hasattr(count_tokens, "truncate"):
+            text = count_tokens.truncate(doc.page_content, remaining)
+            packed.append(Document(page_content=text, metadata={**doc.metadata, "truncated": True}))
+        break
+    return packed
+
+
+def pack_context(docs, budget, count_tokens, dedup_threshold=0.8):
+    return fit_budget(drop_near_duplicates(merge_neighbours(docs), dedup_threshold), budget, count_tokens)
+
+
+class PackedContextRetriever(BaseRetriever):
+    """Wraps a retriever so the documents it returns are merged, de-duplicated
+    and trimmed to ``budget`` tokens before they reach the stuff-documents chain."""
+
+    retriever: Any
+    count_tokens: Any
+    budget: int = 3000
+    dedup_threshold: float = 0.8
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        docs = self.retriever.invoke(query)
+        return pack_context(docs, self.budget, self.count_tokens, self.dedup_threshold)
@@ -0,0 +1,109 @@
+import re
+import zlib
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1  # hash values are taken mod this Mersenne prime
+
+
+# ------------------------------
+# 🧬 MinHash near-duplicate index
+# ------------------------------
+class NearDuplicateIndex:
+    """MinHash signatures of stored chunks, bucketed with LSH for sub-linear lookup.
+
+    Two chunks are near-duplicates when the estimated Jaccard similarity of
+    their word 5-gram sets is at least ``threshold``. ``bands`` x
+    ``num_perm / bands`` banding makes pairs above roughly 0.7 similarity
+    collide in some bucket; candidates are then checked against the full
+    signature. Signatures are keyed by docstore id so the index follows the
+    FAISS store through adds and deletes, like ``BM25Index``.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Universal hashing (a * x + b) mod p; a, x < 2**32 so the product fits in uint64
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.signatures = {}  # docstore id -> uint32[num_perm]
+        self.buckets = {}     # (band, band bytes) -> [docstore ids]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, text):
+        words = _WORD.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        rows = self.num_perm // self.bands
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, signature):
+        """Docstore id of the most similar stored chunk at or above ``threshold``, else None."""
+        best_id, best = None, self.threshold
+        seen = set()
+        for key in self._band_keys(signature):
+            for doc_id in self.buckets.get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                similarity = float(np.mean(self.signatures[doc_id] == signature))
+                if similarity >= best:
+                    best_id, best = doc_id, similarity
+        return best_id
+
+    def add(self, doc_id, signature):
+        self.signatures[doc_id] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(doc_id)
+
+    def remove(self, ids):
+        for doc_id in ids:
+            signature = self.signatures.pop(doc_id, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.remove(doc_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def empty_like(self):
+        """A new, empty index with the same settings."""
+        return NearDuplicateIndex(self.threshold, self.num_perm, self.bands, self.shingle_size, self.seed)
+
+    def rebuild(self, docstore, index_to_docstore_id):
+        """An index with these settings over every chunk in a FAISS docstore."""
+        index = self.empty_like()
+        for doc_id in index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if doc is not None and not isinstance(doc, str):
+                index.add(doc_id, index.signature(doc.page_content))
+        return index
+
+
+def provenance(metadata):
+    """The ``{"source", "page", "file_hash"}`` entries a stored chunk stands for."""
+    return metadata.get("sources") or [
+        {"source": metadata.get("source"), "page": metadata.get("page"), "file_hash": metadata.get("file_hash")}
+    ]
+
+
+def format_sources(metadata):
+    return ", ".join(
+        f"{entry['source']} p.{entry['page'] + 1}" if isinstance(entry.get("page"), int) else str(entry["source"])
+        for entry in provenance(metadata)
+    )
@@ -0,0 +1,257 @@
+"""Embedding backends for the RAG app, all behind LangChain's ``Embeddings`` interface.
+
+    openai  text-embedding-3-large over HTTP (``async_embeddings``)
+    local   a model directory on disk, run on the CPU:
+              vocab.txt + embeddings.npy [+ weights.npy]  static token vectors, NumPy
+              model.onnx + tokenizer.json                 transformer encoder, onnxruntime
+    hash    feature hashing, for tests and the offline stub server
+
+Convert a GloVe/word2vec text file into a local model directory with
+
+    python embedding_backends.py convert glove.6B.300d.txt models/glove-300
+"""
+import argparse
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+OPENAI = "openai"
+LOCAL = "local"
+HASH = "hash"
+BACKENDS = [OPENAI, LOCAL, HASH]
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+VOCAB_FILE = "vocab.txt"
+VECTORS_FILE = "embeddings.npy"
+WEIGHTS_FILE = "weights.npy"
+ONNX_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def _fingerprint(path, names):
+    """Short hash of the model files' sizes and mtimes, so cache keys change when weights do."""
+    digest = hashlib.sha256()
+    for name in names:
+        file_path = os.path.join(path, name)
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _l2_normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _BatchedEmbeddings(Embeddings):
+    """Splits work into ``batch_size`` batches and encodes them on ``threads`` threads.
+
+    NumPy and onnxruntime release the GIL in their kernels, so batches run in
+    parallel on a multi-core machine.
+    """
+
+    def __init__(self, batch_size=256, threads=None):
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="embed")
+
+    def _encode(self, texts):
+        raise NotImplementedError
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._encode(batches[0]).tolist()
+        return np.concatenate(list(self._pool.map(self._encode, batches))).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+# ------------------------------
+# 🔢 Feature hashing (deterministic, offline)
+# ------------------------------
+@functools.lru_cache(maxsize=1 << 16)
+def _token_slot(token, dim):
+    value = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+def hash_embedding(text, dim=256):
+    """Bag-of-words feature hashing, L2-normalised. Same text -> same vector."""
+    vector = [0.0] * dim
+    for token in text.lower().split():
+        slot, sign = _token_slot(token, dim)
+        vector[slot] += sign
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class HashEmbeddings(Embeddings):
+    """LangChain embeddings over ``hash_embedding``: deterministic, offline, CPU-cheap."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.model_name = f"hash:{dim}"
+
+    def embed_documents(self, texts):
+        return [hash_embedding(text, self.dim) for text in texts]
+
+    def embed_query(self, text):
+        return hash_embedding(text, self.dim)
+
+
+# ------------------------------
+# 🧮 Static token vectors (NumPy)
+# ------------------------------
+class StaticEmbeddings(_BatchedEmbeddings):
+    """Weighted mean of per-token vectors, L2-normalised.
+
+    The model directory holds ``vocab.txt`` (one token per line),
+    ``embeddings.npy`` (vocab x dim, float32 or float16) and optionally
+    ``weights.npy`` (one weight per token, e.g. IDF). The matrix is
+    memory-mapped, so a large vocabulary costs page cache rather than RAM.
+    """
+
+    def __init__(self, path, batch_size=256, threads=None, lowercase=True):
+        super().__init__(batch_size, threads)
+        with open(os.path.join(path, VOCAB_FILE), encoding="utf-8") as f:
+            self.vocab = {line.rstrip("\n"): row for row, line in enumerate(f)}
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        weights_path = os.path.join(path, WEIGHTS_FILE)
+        self.weights = np.load(weights_path).astype(np.float32) if os.path.exists(weights_path) else None
+        self.lowercase = lowercase
+        self.dim = self.vectors.shape[1]
+        fingerprint = _fingerprint(path, [VOCAB_FILE, VECTORS_FILE, WEIGHTS_FILE])
+        self.model_name = f"static:{os.path.basename(os.path.normpath(path))}:{self.dim}:{fingerprint}"
+
+    def _token_ids(self, text):
+        if self.lowercase:
+            text = text.lower()
+        vocab = self.vocab
+        return [vocab[token] for token in _TOKEN.findall(text) if token in vocab]
+
+    def _encode(self, texts):
+        ids = [self._token_ids(text) for text in texts]
+        lengths = np.fromiter((len(row) for row in ids), dtype=np.int64, count=len(ids))
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        filled = lengths > 0
+        if not filled.any():
+            return out
+        flat = np.fromiter((token for row in ids for token in row), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.asarray(self.vectors[flat], dtype=np.float32)
+        if self.weights is not None:
+            rows *= self.weights[flat, None]
+        # Sum each text's token rows in one pass; empty texts stay zero
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[filled]
+        out[filled] = np.add.reduceat(rows, starts, axis=0)
+        return _l2_normalize(out)
+
+
+# ------------------------------
+# 🧠 Transformer encoder (ONNX Runtime)
+# ------------------------------
+class OnnxEmbeddings(_BatchedEmbeddings):
+    """Mean-pooled ``last_hidden_state`` of an exported sentence encoder.
+
+    Needs ``onnxruntime`` and ``tokenizers`` (``pip install onnxruntime tokenizers``).
+    The model directory holds ``model.onnx`` and ``tokenizer.json``, as written
+    by ``optimum-cli export onnx`` for e.g. all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, path, batch_size=32, threads=None, max_length=512):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The ONNX embedding backend needs `pip install onnxruntime tokenizers`.") from e
+        super().__init__(batch_size, threads)
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        # Parallelism comes from running batches on our threads, one ORT thread each
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, ONNX_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        fingerprint = _fingerprint(path, [ONNX_FILE, TOKENIZER_FILE])
+        self.model_name = f"onnx:{os.path.basename(os.path.normpath(path))}:{fingerprint}"
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return _l2_normalize(pooled.astype(np.float32))
+
+
+def load_local_embeddings(path, batch_size=None, threads=None):
+    """Pick the local backend from what the model directory contains."""
+    if os.path.exists(os.path.join(path, ONNX_FILE)):
+        return OnnxEmbeddings(path, batch_size=batch_size or 32, threads=threads)
+    if os.path.exists(os.path.join(path, VECTORS_FILE)):
+        return StaticEmbeddings(path, batch_size=batch_size or 256, threads=threads)
+    raise FileNotFoundError(f"No {ONNX_FILE} or {VECTORS_FILE} in embedding model directory {path!r}")
+
+
+def load_embeddings(backend, model_path=None, threads=None):
+    """The in-process backends, ``local`` and ``hash``; ``openai`` needs an API key and is built by the caller."""
+    if backend == LOCAL:
+        if not model_path:
+            raise ValueError("The local embedding backend needs a model directory (RAG_LOCAL_MODEL_PATH).")
+        return load_local_embeddings(model_path, threads=threads)
+    if backend == HASH:
+        return HashEmbeddings()
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+
+
+def convert_text_vectors(source, out_dir, max_words=None):
+    """Write a GloVe/word2vec text file (``word v1 v2 ...`` per line) as a static model directory."""
+    os.makedirs(out_dir, exist_ok=True)
+    words, rows = [], []
+    with open(source, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip().split(" ")
+            if len(parts) == 2 and not words:
+                continue  # word2vec header: "<count> <dim>"
+            words.append(parts[0])
+            rows.append(np.asarray(parts[1:], dtype=np.float32))
+            if max_words and len(words) >= max_words:
+                break
+    np.save(os.path.join(out_dir, VECTORS_FILE), np.stack(rows))
+    with open(os.path.join(out_dir, VOCAB_FILE), "w", encoding="utf-8") as f:
+        f.write("\n".join(words) + "\n")
+    with open(os.path.join(out_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.basename(source), "vocab": len(words), "dim": len(rows[0])}, f)
+    return len(words), len(rows[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="GloVe/word2vec text file -> local static model directory")
+    convert.add_argument("source")
+    convert.add_argument("out_dir")
+    convert.add_argument("--max-words", type=int, default=None, help="keep only the first (most frequent) words")
+    args = parser.parse_args()
+    vocab, dim = convert_text_vectors(args.source, args.out_dir, args.max_words)
+    print(f"Wrote {vocab} x {dim} vectors to {args.out_dir}")
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+
+# ------------------------------
+# 🗄️ On-disk LRU store for embedding vectors
+# ------------------------------
+class EmbeddingCacheStore:
+    """SQLite-backed key/vector store bounded to ``max_bytes`` with LRU eviction."""
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON vectors(last_access)")
+        self._conn.commit()
+
+    def mget(self, keys):
+        if not keys:
+            return []
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM vectors WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def mset(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), now) for key, value in items],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM vectors").fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM vectors").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM vectors ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM vectors WHERE key = ?", victims)
+
+
+# ------------------------------
+# 🧠 Content-addressed embeddings wrapper
+# ------------------------------
+def _encode(vector):
+    return array("f", vector).tobytes()
+
+
+def _decode(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings model so each text is embedded once per model name.
+
+    Keys are ``sha256(model_name + text)``, so identical chunks coming from
+    re-uploaded or re-split PDFs hit the cache regardless of file name.
+    """
+
+    def __init__(self, underlying, store, model_name):
+        self.underlying = underlying
+        self.store = store
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        cached = self.store.mget(keys)
+        missing = [i for i, blob in enumerate(cached) if blob is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        vectors = [None if blob is None else _decode(blob) for blob in cached]
+        if missing:
+            # Embed each distinct missing text once, even if it repeats in the batch
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            first = {}
+            for i in missing:
+                first.setdefault(keys[i], i)
+            fresh = self.underlying.embed_documents([texts[first[key]] for key in unique])
+            by_key = {key: list(vector) for key, vector in zip(unique, fresh)}
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+            self.store.mset([(key, _encode(by_key[key])) for key in unique])
+        return vectors
+
+    def embed_query(self, text):
+        key = "q:" + self._key(text)
+        blob = self.store.mget([key])[0]
+        if blob is not None:
+            self.hits += 1
+            return _decode(blob)
+        self.misses += 1
+        vector = list(self.underlying.embed_query(text))
+        self.store.mset([(key, _encode(vector))])
+        return vector
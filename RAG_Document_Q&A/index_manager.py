@@ -0,0 +1,244 @@
+import copy
+import hashlib
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+import ann_index
+from dedup import provenance
+from retrieval import BM25Index
+from tracing import NULL_TRACE
+
+
+# ------------------------------
+# 📇 Incremental FAISS index keyed by file content
+# ------------------------------
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class IndexManager:
+    """Keeps a FAISS store in sync with the set of uploaded files.
+
+    Every file is identified by the SHA-256 of its bytes. Only files that are
+    new since the last ``sync`` are split and embedded, and the vectors of
+    files that were removed from the uploader are deleted from the store.
+
+    With a ``dedup`` index (``dedup.NearDuplicateIndex``), chunks that nearly
+    match one already stored (e.g. arXiv v1 and v2 of a paper) are not
+    embedded; the stored chunk's ``sources`` metadata records every file and
+    page it stands for, and the file lists it under ``duplicates``. Removing
+    the file that owns a shared chunk hands the chunk to a remaining file.
+    """
+
+    def __init__(self, embeddings, ingest, flush_size=512, index_type=ann_index.FLAT, dedup=None):
+        # ingest([(file_hash, name, data), ...], trace) -> iterable of (file_hash, chunks) batches
+        self.embeddings = embeddings
+        self.ingest = ingest
+        self.index_type = index_type
+        # Chunks are buffered across ingest batches so each embed call is big
+        # enough for the embeddings client to pack and parallelise requests
+        self.flush_size = flush_size
+        self.vector_store = None
+        self.bm25 = BM25Index()  # keyword index over the same chunks, kept in step with the store
+        self.dedup = dedup
+        self.files = {}  # file hash -> {"name": ..., "ids": [...], "duplicates": [...]}
+        # True while vector_store wraps a read-only index shared with other sessions
+        self.shared = False
+
+    def adopt(self, index, docstore, index_to_docstore_id, files, bm25=None, dedup=None):
+        """Serve a saved (memory-mapped) index without copying it.
+
+        The index is only copied into private memory if a later ``sync``
+        needs to add or remove vectors.
+        """
+        self.vector_store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+        self.bm25 = bm25 if bm25 is not None else BM25Index.from_docstore(docstore, index_to_docstore_id)
+        if self.dedup is not None:
+            self.dedup = dedup if dedup is not None else self.dedup.rebuild(docstore, index_to_docstore_id)
+        self.files = {
+            digest: {"name": entry["name"], "ids": list(entry["ids"]), "duplicates": list(entry.get("duplicates", []))}
+            for digest, entry in files.items()
+        }
+        self.shared = True
+
+    def _make_private(self):
+        if not self.shared:
+            return
+        # clone_index would keep viewing the mmapped pages; a serialize round trip owns its data
+        index = faiss.deserialize_index(faiss.serialize_index(self.vector_store.index))
+        docstore = InMemoryDocstore(dict(self.vector_store.docstore._dict))
+        self.vector_store = FAISS(self.embeddings, index, docstore, dict(self.vector_store.index_to_docstore_id))
+        self.bm25 = copy.deepcopy(self.bm25)
+        self.dedup = copy.deepcopy(self.dedup)
+        self.shared = False
+
+    def sync(self, files, trace=NULL_TRACE):
+        """Bring the index in line with ``files`` (an iterable of ``(name, bytes)``).
+
+        Embedding and index updates are recorded as ``embed`` and
+        ``index_build`` spans on ``trace``. Returns ``(added_names, removed_names)``.
+        """
+        current = {}
+        for name, data in files:
+            current.setdefault(file_hash(data), (name, data))
+
+        removed = [digest for digest in self.files if digest not in current]
+        added = [digest for digest in current if digest not in self.files]
+        if removed or added:
+            self._make_private()
+
+        removed_names = []
+        for digest in removed:
+            entry = self.files.pop(digest)
+            with trace.span("index_build", op="delete", vectors=len(entry["ids"])):
+                self._drop_file(digest, entry)
+            removed_names.append(entry["name"])
+
+        new_files = [(digest,) + current[digest] for digest in added]
+        for digest, name, _ in new_files:
+            self.files[digest] = {"name": name, "ids": [], "duplicates": []}
+        pending = []
+        try:
+            for digest, chunks in self.ingest(new_files, trace):
+                pending.extend((digest, chunk) for chunk in chunks)
+                if len(pending) >= self.flush_size:
+                    self._add_chunks(pending, trace)
+                    pending = []
+            self._add_chunks(pending, trace)
+        except Exception:
+            # Leave the index as it was before this sync rather than half-ingested
+            for digest in added:
+                self._drop_file(digest, self.files.pop(digest))
+            raise
+
+        # Switch to (or retrain) the configured ANN index once there are enough vectors
+        if self.vector_store is not None and ann_index.wants_rebuild(self.vector_store.index, self.index_type):
+            with trace.span("index_build", op="convert", index_type=self.index_type):
+                self._make_private()
+                ann_index.convert(self.vector_store, self.index_type)
+
+        return [name for _, name, _ in new_files], removed_names
+
+    def _drop_file(self, digest, entry):
+        # Chunks another file also contains stay in the store and pass to that file
+        doomed = []
+        for chunk_id in entry["ids"]:
+            sources = self._drop_provenance(chunk_id, digest)
+            heir = sources[0]["file_hash"] if sources else None
+            if heir not in self.files:
+                doomed.append(chunk_id)
+                continue
+            heir_entry = self.files[heir]
+            if chunk_id in heir_entry["duplicates"]:
+                heir_entry["duplicates"].remove(chunk_id)
+            heir_entry["ids"].append(chunk_id)
+        for chunk_id in entry["duplicates"]:
+            self._drop_provenance(chunk_id, digest)
+        self._remove_ids(doomed)
+
+    def _set_provenance(self, chunk_id, doc, sources):
+        metadata = {**doc.metadata, "sources": sources}
+        if sources:
+            metadata.update(source=sources[0]["source"], page=sources[0]["page"], file_hash=sources[0]["file_hash"])
+        # The first source owns the chunk. The Document is replaced rather than
+        # mutated because it may also sit in a shared, cached docstore
+        self.vector_store.docstore._dict[chunk_id] = Document(
+            page_content=doc.page_content, metadata=metadata, id=getattr(doc, "id", None)
+        )
+
+    def _drop_provenance(self, chunk_id, digest):
+        """Forget file ``digest`` as a source of ``chunk_id``; returns the remaining sources."""
+        doc = self.vector_store.docstore.search(chunk_id)
+        if doc is None or isinstance(doc, str):
+            return []
+        sources = provenance(doc.metadata)
+        remaining = [entry for entry in sources if entry["file_hash"] != digest]
+        if remaining and len(remaining) < len(sources):
+            self._set_provenance(chunk_id, doc, remaining)
+        return remaining
+
+    def _merge_duplicate(self, original_id, batch, digest, chunk):
+        """Record ``chunk`` (from file ``digest``) as another source of the stored ``original_id``."""
+        entry = self.files[digest]
+        source = {"source": entry["name"], "page": chunk.metadata.get("page"), "file_hash": digest}
+        if original_id in batch:
+            owner, original = batch[original_id]
+            original.metadata["sources"].append(source)
+        else:
+            doc = self.vector_store.docstore.search(original_id)
+            owner = doc.metadata.get("file_hash")
+            self._set_provenance(original_id, doc, provenance(doc.metadata) + [source])
+        if owner != digest and original_id not in entry["duplicates"]:
+            entry["duplicates"].append(original_id)
+
+    def _next_id(self, digest, next_index, batch):
+        index = next_index.get(digest, len(self.files[digest]["ids"]))
+        # Ids handed over from a removed file can occupy numbers this file would use next
+        stored = self.vector_store.docstore._dict if self.vector_store is not None else {}
+        while f"{digest}:{index}" in stored or f"{digest}:{index}" in batch:
+            index += 1
+        next_index[digest] = index + 1
+        return f"{digest}:{index}"
+
+    def _remove_ids(self, ids):
+        if ids:
+            ann_index.delete(self.vector_store, ids)
+            self.bm25.remove(ids)
+            if self.dedup is not None:
+                self.dedup.remove(ids)
+
+    def _add_chunks(self, pending, trace=NULL_TRACE):
+        if not pending:
+            return
+        chunks, ids, next_index = [], [], {}
+        batch = {}  # chunk id -> (file hash, chunk) for duplicates within this batch
+        with trace.span("dedup"):
+            for digest, chunk in pending:
+                entry = self.files[digest]
+                chunk.metadata["source"] = entry["name"]
+                chunk.metadata["file_hash"] = digest
+                if self.dedup is not None:
+                    signature = self.dedup.signature(chunk.page_content)
+                    original_id = self.dedup.find(signature)
+                    if original_id is not None:
+                        self._merge_duplicate(original_id, batch, digest, chunk)
+                        trace.count("duplicate_chunks")
+                        continue
+                chunk_id = self._next_id(digest, next_index, batch)
+                if self.dedup is not None:
+                    chunk.metadata["sources"] = provenance(chunk.metadata)
+                    self.dedup.add(chunk_id, signature)
+                batch[chunk_id] = (digest, chunk)
+                chunks.append(chunk)
+                ids.append(chunk_id)
+        if not chunks:
+            return
+        try:
+            self._store_chunks(chunks, ids, trace)
+        except Exception:
+            if self.dedup is not None:
+                self.dedup.remove(ids)
+            raise
+        # Record ids only once they are actually in the store
+        for chunk_id in ids:
+            self.files[batch[chunk_id][0]]["ids"].append(chunk_id)
+
+    def _store_chunks(self, chunks, ids, trace):
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        # Embed separately from the FAISS add so the two show up as different stages
+        with trace.span("embed", texts=len(texts)):
+            vectors = self.embeddings.embed_documents(texts)
+        with trace.span("index_build", op="add", vectors=len(vectors)):
+            if self.vector_store is None:
+                self.vector_store = FAISS.from_embeddings(zip(texts, vectors), self.embeddings, metadatas, ids=ids)
+            else:
+                self.vector_store.add_embeddings(zip(texts, vectors), metadatas, ids=ids)
+            self.bm25.add(ids, texts)
+        trace.count("embedded_chunks", len(texts))
+
+    def __len__(self):
+        return sum(len(entry["ids"]) for entry in self.files.values())
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import uuid
+
+import faiss
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.pkl"
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.pkl"
+DEDUP_FILE = "dedup.pkl"
+INFO_FILE = "info.json"
+
+# Older faiss builds only know IO_FLAG_MMAP; newer ones also map flat code arrays
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def corpus_key(model_name, file_hashes):
+    """Stable name for an index built from exactly these files with this model."""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for value in sorted(set(file_hashes)):
+        digest.update(value.encode("ascii"))
+    return digest.hexdigest()[:32]
+
+
+# ------------------------------
+# 💾 Named on-disk FAISS indexes
+# ------------------------------
+class IndexStore:
+    """Directory of saved indexes, one sub-directory per corpus key.
+
+    Indexes are opened memory-mapped and read-only, so every session that
+    opens the same name shares one set of pages in the OS cache instead of
+    holding a private copy in RAM.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self._dir(name), MANIFEST_FILE))
+
+    def names(self):
+        """Saved index names, most recently saved first."""
+        names = [entry.name for entry in os.scandir(self.root) if entry.is_dir() and self.exists(entry.name)]
+        return sorted(names, key=lambda name: os.path.getmtime(os.path.join(self._dir(name), MANIFEST_FILE)), reverse=True)
+
+    def info(self, name):
+        """The ``info`` dict saved with an index (embedding model, index type...), or ``{}``."""
+        try:
+            with open(os.path.join(self._dir(name), INFO_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, name, vector_store, files, bm25=None, dedup=None, info=None):
+        # Write to a scratch directory and rename, so readers never see a partial index
+        tmp_dir = os.path.join(self.root, f".{name}.{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            faiss.write_index(vector_store.index, os.path.join(tmp_dir, INDEX_FILE))
+            with open(os.path.join(tmp_dir, DOCSTORE_FILE), "wb") as f:
+                pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f)
+            if bm25 is not None:
+                with open(os.path.join(tmp_dir, BM25_FILE), "wb") as f:
+                    pickle.dump(bm25, f)
+            if dedup is not None:
+                with open(os.path.join(tmp_dir, DEDUP_FILE), "wb") as f:
+                    pickle.dump(dedup, f)
+            if info is not None:
+                with open(os.path.join(tmp_dir, INFO_FILE), "w", encoding="utf-8") as f:
+                    json.dump(info, f)
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(files, f)
+            os.rename(tmp_dir, self._dir(name))
+        except OSError:
+            # Another session saved the same corpus first; theirs is identical
+            if not self.exists(name):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def open(self, name):
+        """Return ``(index, docstore, index_to_docstore_id, files, bm25, dedup)`` for a saved index.
+
+        ``bm25`` and ``dedup`` are None for indexes saved without a keyword or
+        near-duplicate index.
+        """
+        path = self._dir(name)
+        index = faiss.read_index(os.path.join(path, INDEX_FILE), MMAP_FLAGS)
+        with open(os.path.join(path, DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            files = json.load(f)
+        return index, docstore, index_to_docstore_id, files, _load_optional(path, BM25_FILE), _load_optional(path, DEDUP_FILE)
+
+
+def _load_optional(directory, filename):
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import as_completed
+from io import BytesIO
+from multiprocessing import shared_memory
+
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from tracing import NULL_TRACE
+
+
+# ------------------------------
+# 📄 Parallel page-level PDF parsing
+# ------------------------------
+PAGES_PER_TASK = 8
+
+# Per worker process: shared-memory name -> PdfReader, so each worker copies and
+# parses a file once however many of its page ranges it is given
+_READERS = {}
+_READERS_MAX = 4
+
+
+def _reader(shm_name, size):
+    reader = _READERS.pop(shm_name, None)
+    if reader is None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            reader = PdfReader(BytesIO(bytes(shm.buf[:size])))
+        finally:
+            shm.close()
+        while len(_READERS) >= _READERS_MAX:
+            _READERS.pop(next(iter(_READERS)))
+    _READERS[shm_name] = reader  # most recently used last
+    return reader
+
+
+def _extract_pages(shm_name, size, start, stop):
+    # Runs inside a worker process: attach to the upload's shared-memory block
+    # instead of receiving the whole file through the task pipe or a temp file.
+    # Returns (wall-clock start, seconds taken, [(page number, text), ...]).
+    started_at = time.time()
+    reader = _reader(shm_name, size)
+    pages = [(number, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+    return started_at, time.time() - started_at, pages
+
+
+class IngestStats:
+    def __init__(self, pages_total=0):
+        self.pages_total = pages_total
+        self.pages_done = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def pages_per_sec(self):
+        return self.pages_done / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def stream_pdf_chunks(files, splitter, executor, pages_per_task=PAGES_PER_TASK, on_progress=None, trace=NULL_TRACE):
+    """Parse ``files`` page by page on ``executor`` and yield split chunks as they arrive.
+
+    ``files`` is a list of ``(key, name, data)`` with the raw PDF bytes. Each
+    file is parsed straight from memory; nothing is written to disk. Yields
+    ``(key, chunks)`` for every completed page range, so the caller can embed
+    early batches while later pages are still being parsed. Worker parse time
+    and split time are recorded on ``trace`` as ``parse`` and ``split`` spans.
+    """
+    stats = IngestStats()
+    futures = {}
+    blocks = []
+    try:
+        for key, name, data in files:
+            with trace.span("open_pdf", file=name):
+                page_count = len(PdfReader(BytesIO(data)).pages)
+            stats.pages_total += page_count
+            shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+            blocks.append(shm)
+            shm.buf[:len(data)] = data
+            for start in range(0, page_count, pages_per_task):
+                stop = min(start + pages_per_task, page_count)
+                futures[executor.submit(_extract_pages, shm.name, len(data), start, stop)] = (key, name)
+
+        for future in as_completed(futures):
+            key, name = futures[future]
+            started_at, duration, pages = future.result()
+            trace.add_epoch_span("parse", started_at, duration, pages=len(pages))
+            documents = [
+                Document(page_content=text, metadata={"source": name, "page": number})
+                for number, text in pages
+            ]
+            with trace.span("split"):
+                chunks = splitter.split_documents(documents)
+            stats.pages_done += len(pages)
+            stats.chunks += len(chunks)
+            trace.count("pages", len(pages))
+            trace.count("chunks", len(chunks))
+            if on_progress:
+                on_progress(stats)
+            if chunks:
+                yield key, chunks
+    finally:
+        # Drop page ranges not yet started (caller stopped early) and free the shared blocks
+        for future in futures:
+            future.cancel()
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,144 @@
+"""The ingest -> retrieve -> answer path of the RAG app, without Streamlit.
+
+The app builds its splitter, retrievers and answer stream from here, and
+``RAGPipeline`` wires the same pieces together for scripts and benchmarks.
+"""
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.prompts import ChatPromptTemplate
+
+from ann_index import FLAT
+from context_packing import PackedContextRetriever, TokenCounter
+from index_manager import IndexManager
+from ingest import stream_pdf_chunks
+from retrieval import HybridRetriever, MMRRetriever
+from tracing import NULL_TRACE
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+HYBRID = "Hybrid (BM25 + vector)"
+VECTOR = "Vector only"
+MMR = "Diverse vector (MMR)"
+RETRIEVAL_MODES = [HYBRID, VECTOR, MMR]
+
+RAG_PROMPT = ChatPromptTemplate.from_template("""
+You are a helpful assistant that answers questions based on the provided documents.
+Answer the question to the best of your ability based on the context provided in the documents.
+If you do not know the answer, say "I don't know".
+
+<context>{context}</context>
+Question: {input}
+""")
+
+
+def make_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def pdf_ingest(executor, splitter=None, on_progress=None):
+    """An ``IndexManager`` ingest callback that parses PDFs on ``executor``."""
+    splitter = splitter or make_splitter()
+
+    def ingest(files, trace=NULL_TRACE):
+        if not files:
+            return
+        yield from stream_pdf_chunks(files, splitter, executor, on_progress=on_progress, trace=trace)
+
+    return ingest
+
+
+def build_retriever(vector_store, bm25, mode=HYBRID, k=4, count_tokens=None, budget=3000, fetch_k=20, mmr_lambda=0.5):
+    """Hybrid, dense or MMR retriever, wrapped so its context fits ``budget`` tokens.
+
+    ``fetch_k`` is the candidate pool for hybrid fusion and MMR; ``mmr_lambda``
+    trades relevance (1) against diversity (0) in MMR mode.
+    """
+    if mode == HYBRID:
+        retriever = HybridRetriever(vector_store=vector_store, bm25=bm25, k=k, fetch_k=fetch_k)
+    elif mode == MMR:
+        retriever = MMRRetriever(vector_store=vector_store, k=k, fetch_k=fetch_k, lambda_mult=mmr_lambda)
+    else:
+        retriever = vector_store.as_retriever(search_kwargs={"k": k})
+    return PackedContextRetriever(retriever=retriever, count_tokens=count_tokens or TokenCounter(), budget=budget)
+
+
+def stream_answer(llm, retriever, question, trace=NULL_TRACE, prompt=RAG_PROMPT):
+    """Yield the retrieval chain's stream chunks (``{"context": docs}``, then ``{"answer": token}``...).
+
+    Records ``retrieval``, ``llm_first_token`` and ``llm_completion`` spans on ``trace``.
+    """
+    chain = create_retrieval_chain(retriever, create_stuff_documents_chain(llm=llm, prompt=prompt))
+    # The chain emits the context once retrieval is done, then the answer tokens
+    stream_start = retrieved_at = trace.now()
+    first_token_at = None
+    for chunk in chain.stream({"input": question}):
+        if "context" in chunk:
+            retrieved_at = trace.now()
+            trace.add_span("retrieval", stream_start, retrieved_at - stream_start)
+        if chunk.get("answer") and first_token_at is None:
+            first_token_at = trace.now()
+            trace.add_span("llm_first_token", retrieved_at, first_token_at - retrieved_at)
+        yield chunk
+    if first_token_at is not None:
+        trace.add_span("llm_completion", retrieved_at, trace.now() - retrieved_at)
+
+
+def collect_answer(chunks):
+    """Drain a ``stream_answer`` stream into ``(answer_text, context_docs)``."""
+    answer_text, context_docs = "", []
+    for chunk in chunks:
+        if "context" in chunk:
+            context_docs = chunk["context"]
+        answer_text += chunk.get("answer") or ""
+    return answer_text, context_docs
+
+
+# ------------------------------
+# 🧰 Headless pipeline
+# ------------------------------
+class RAGPipeline:
+    """Ingest PDFs, retrieve and answer with any LangChain embeddings and chat model.
+
+    ``executor`` parses PDF pages (a process pool in production; any
+    ``concurrent.futures`` executor works). Pass a ``dedup.NearDuplicateIndex``
+    as ``dedup`` to merge near-duplicate chunks at ingest.
+    """
+
+    def __init__(self, embeddings, llm, executor, index_type=FLAT, retrieval_mode=HYBRID, k=4,
+                 context_tokens=3000, count_tokens=None, splitter=None, flush_size=512, dedup=None,
+                 fetch_k=20, mmr_lambda=0.5):
+        self.llm = llm
+        self.retrieval_mode = retrieval_mode
+        self.k = k
+        self.fetch_k = fetch_k
+        self.mmr_lambda = mmr_lambda
+        self.context_tokens = context_tokens
+        self.count_tokens = count_tokens or TokenCounter()
+        self.manager = IndexManager(embeddings, pdf_ingest(executor, splitter), flush_size, index_type, dedup)
+
+    @property
+    def vector_store(self):
+        return self.manager.vector_store
+
+    def ingest(self, files, trace=NULL_TRACE):
+        """Sync the index with ``files`` (``[(name, pdf bytes), ...]``); returns ``(added, removed)``."""
+        return self.manager.sync(files, trace)
+
+    def retriever(self):
+        return build_retriever(
+            self.manager.vector_store, self.manager.bm25, self.retrieval_mode,
+            self.k, self.count_tokens, self.context_tokens, self.fetch_k, self.mmr_lambda,
+        )
+
+    def retrieve(self, question, trace=NULL_TRACE):
+        with trace.span("retrieval"):
+            return self.retriever().invoke(question)
+
+    def stream(self, question, trace=NULL_TRACE):
+        return stream_answer(self.llm, self.retriever(), question, trace)
+
+    def answer(self, question, trace=NULL_TRACE):
+        """Return ``(answer_text, context_docs)``."""
+        return collect_answer(self.stream(question, trace))
@@ -1,21 +1,24 @@
 import streamlit as st
 import os
-import time
-import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
 import speech_recognition as sr
-from gtts import gTTS
-import base64
-from io import BytesIO
+from embedding_cache import EmbeddingCacheStore, CachedEmbeddings
+from async_embeddings import AsyncBatchEmbeddings
+from embedding_backends import OPENAI, load_embeddings
+from index_manager import IndexManager, file_hash
+from index_store import IndexStore, corpus_key
+from dedup import NearDuplicateIndex, format_sources
+from ann_index import INDEX_TYPES, FLAT
+from answer_cache import SemanticAnswerCache
+from context_packing import TokenCounter
+from tts import AudioCache, SentenceTTSPipeline, TTSService, gtts_synthesize
+from stubs import stub_synthesize
+from pipeline import MMR, RETRIEVAL_MODES, build_retriever, pdf_ingest, stream_answer
+from tracing import Trace, TraceLog, stage_summary
 
 # 🌱 Load environment variables
 load_dotenv()
@@ -23,6 +26,30 @@ load_dotenv()
 # 🎨 Page config
 st.set_page_config(page_title="RAG Chatbot", page_icon="📚", layout="wide")
 
+# 🗄️ Embedding settings
+EMBEDDING_MODEL = "text-embedding-3-large"
+# "openai", "local" (model directory in RAG_LOCAL_MODEL_PATH, runs on the CPU) or "hash" (offline testing)
+EMBEDDING_BACKEND = os.getenv("RAG_EMBEDDING_BACKEND", OPENAI)
+LOCAL_MODEL_PATH = os.getenv("RAG_LOCAL_MODEL_PATH", "")
+EMBED_THREADS = int(os.getenv("RAG_EMBED_THREADS", str(os.cpu_count() or 1)))
+CACHE_DIR = os.getenv("RAG_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rag_cache"))
+EMBED_CACHE_MAX_MB = int(os.getenv("RAG_EMBED_CACHE_MB", "512"))
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", str(os.cpu_count() or 1)))
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+EMBED_BATCH_TOKENS = int(os.getenv("RAG_EMBED_BATCH_TOKENS", "50000"))
+INDEX_STORE_DIR = os.getenv("RAG_INDEX_STORE_DIR", os.path.join(CACHE_DIR, "indexes"))
+# llama3-8b-8192 has an 8k window; leave room for the prompt, question and answer
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "3000"))
+TTS_CACHE_MAX_MB = int(os.getenv("RAG_TTS_CACHE_MB", "256"))
+TTS_WORKERS = int(os.getenv("RAG_TTS_WORKERS", "4"))
+TTS_BACKEND = os.getenv("RAG_TTS_BACKEND", "gtts")  # "stub" for offline testing
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+# Chunks at least this similar (MinHash Jaccard of word 5-grams) to a stored one are merged; 0 disables
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+TRACE_FILE = os.getenv("RAG_TRACE_FILE", os.path.join(CACHE_DIR, "traces.jsonl"))
+
 # ------------------------------
 # 🌟 Sidebar UI & API Keys
 # ------------------------------
@@ -61,25 +88,55 @@ if groq_api_key and not groq_api_key.startswith("gsk_"):
     st.sidebar.warning("❌ Invalid Groq API Key. Must start with 'gsk_'.")
     groq_api_key = None
 
-# 🟢 OpenAI API Key
-openai_api_key = st.sidebar.text_input("🔑 Enter your OpenAI API Key", type="password")
-if openai_api_key and not openai_api_key.startswith("sk-"):
-    st.sidebar.warning("❌ Invalid OpenAI API Key. Must start with 'sk-'.")
-    openai_api_key = None
+# 🟢 OpenAI API Key (only needed for OpenAI embeddings)
+openai_api_key = None
+if EMBEDDING_BACKEND == OPENAI:
+    openai_api_key = st.sidebar.text_input("🔑 Enter your OpenAI API Key", type="password")
+    if openai_api_key and not openai_api_key.startswith("sk-"):
+        st.sidebar.warning("❌ Invalid OpenAI API Key. Must start with 'sk-'.")
+        openai_api_key = None
 
 # ✅ Check both keys before proceeding
-if not groq_api_key or not openai_api_key:
-    st.info("Please enter **both** Groq and OpenAI API Keys to proceed.")
+if not groq_api_key or (EMBEDDING_BACKEND == OPENAI and not openai_api_key):
+    if EMBEDDING_BACKEND == OPENAI:
+        st.info("Please enter **both** Groq and OpenAI API Keys to proceed.")
+    else:
+        st.info("Please enter your Groq API Key to proceed.")
     st.stop()
 else:
     os.environ["GROQ_API_KEY"] = groq_api_key
-    os.environ["OPENAI_API_KEY"] = openai_api_key
+    if openai_api_key:
+        os.environ["OPENAI_API_KEY"] = openai_api_key
 
 # ------------------------------
 # 🌍 Language Toggle
 # ------------------------------
 language = st.sidebar.selectbox("🌐 Choose Language", ["English", "हिन्दी"])
 
+# 🧭 Vector index type (compressed indexes for large paper collections)
+default_index = os.getenv("RAG_INDEX_TYPE", FLAT)
+index_type = st.sidebar.selectbox(
+    "🧭 Vector index",
+    INDEX_TYPES,
+    index=INDEX_TYPES.index(default_index) if default_index in INDEX_TYPES else 0,
+    help="Flat is exact. HNSW is fastest to search, IVF-PQ uses the least memory "
+         "(trained automatically once there are enough chunks), SQ8/Float16 shrink vectors 4x/2x.",
+)
+
+# 🔀 Retrieval mode
+retrieval_mode = st.sidebar.selectbox("🔀 Retrieval", RETRIEVAL_MODES)
+RETRIEVAL_K = int(os.getenv("RAG_RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RAG_RETRIEVAL_FETCH_K", "20"))
+mmr_lambda = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+if retrieval_mode == MMR:
+    mmr_lambda = st.sidebar.slider(
+        "🎯 Relevance vs. diversity", 0.0, 1.0, mmr_lambda, 0.05,
+        help="1 keeps the plain top matches; lower values skip chunks that repeat ones already picked.",
+    )
+
+# 🐞 Per-stage timings (always logged to TRACE_FILE; this only toggles the panel)
+show_trace = st.sidebar.checkbox("🐞 Show latency trace", value=os.getenv("RAG_DEBUG") == "1")
+
 TEXT = {
     "English": {
         "title": "📚 Research Paper Q&A Chatbot",
@@ -224,38 +281,127 @@ except Exception as e:
     st.error(f"{TEXT[language]['model_error']} {e}")
     st.stop()
 
-prompt = ChatPromptTemplate.from_template("""
-You are a helpful assistant that answers questions based on the provided documents.
-Answer the question to the best of your ability based on the context provided in the documents.
-If you do not know the answer, say "I don't know".
-
-<context>{context}</context>
-Question: {input}
-""")
-
 uploaded_files = st.file_uploader(TEXT[language]["upload"], type=["pdf"], accept_multiple_files=True)
 
 # ------------------------------
 # Vector Embeddings
 # ------------------------------
-def create_vector_embeddings():
+@st.cache_resource
+def get_embedding_cache():
+    return EmbeddingCacheStore(os.path.join(CACHE_DIR, "embeddings.sqlite"), max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024)
+
+@st.cache_resource
+def get_local_embeddings():
+    # Model weights are loaded once and shared by every session
+    return load_embeddings(EMBEDDING_BACKEND, LOCAL_MODEL_PATH, threads=EMBED_THREADS)
+
+@st.cache_resource
+def get_index_store():
+    return IndexStore(INDEX_STORE_DIR)
+
+@st.cache_resource(max_entries=16)
+def open_shared_index(name):
+    # One memory-mapped copy per saved corpus, shared by every session and rerun
+    return get_index_store().open(name)
+
+@st.cache_resource
+def get_answer_cache():
+    return SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+
+@st.cache_resource
+def get_token_counter():
+    return TokenCounter()
+
+@st.cache_resource
+def get_tts_service():
+    synthesize = stub_synthesize if TTS_BACKEND == "stub" else gtts_synthesize
+    cache = AudioCache(os.path.join(CACHE_DIR, "tts"), max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
+    return TTSService(synthesize, cache, workers=TTS_WORKERS)
+
+@st.cache_resource
+def get_trace_log():
+    return TraceLog(TRACE_FILE)
+
+@st.cache_resource
+def get_ingest_pool():
+    # "spawn" keeps workers independent of the Streamlit server's threads
+    return ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def ingest_pdfs(files, trace):
+    if not files:
+        return
+    progress = st.progress(0.0, text="📄 Parsing PDFs...")
+
+    def report(stats):
+        progress.progress(
+            stats.pages_done / max(stats.pages_total, 1),
+            text=f"📄 Parsed {stats.pages_done}/{stats.pages_total} pages · {stats.pages_per_sec:.1f} pages/sec",
+        )
+
+    yield from pdf_ingest(get_ingest_pool(), on_progress=report)(files, trace)
+
+def create_vector_embeddings(trace):
     try:
-        st.session_state.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-        documents = []
-        for uploaded_file in uploaded_files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_file_path = tmp_file.name
-            loader = PyPDFLoader(tmp_file_path)
-            documents.extend(loader.load())
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        final_docs = text_splitter.split_documents(documents)
-        st.session_state.vector_store = FAISS.from_documents(final_docs, st.session_state.embeddings)
-        st.success(TEXT[language]["embedding_success"])
+        # One index manager per session; only new/removed files touch the index
+        if "index_manager" not in st.session_state:
+            if EMBEDDING_BACKEND == OPENAI:
+                client = AsyncBatchEmbeddings(
+                    model=EMBEDDING_MODEL,
+                    api_key=openai_api_key,
+                    batch_tokens=EMBED_BATCH_TOKENS,
+                    max_concurrency=EMBED_CONCURRENCY,
+                )
+                model_name = EMBEDDING_MODEL
+            else:
+                client = get_local_embeddings()
+                model_name = client.model_name
+            st.session_state.embeddings = CachedEmbeddings(client, get_embedding_cache(), model_name)
+            dedup = NearDuplicateIndex(DEDUP_THRESHOLD) if DEDUP_THRESHOLD > 0 else None
+            st.session_state.index_manager = IndexManager(st.session_state.embeddings, ingest_pdfs, dedup=dedup)
+        manager = st.session_state.index_manager
+        manager.index_type = index_type
+        with trace.span("upload_read", files=len(uploaded_files)):
+            files = [(f.name, f.getvalue()) for f in uploaded_files]
+            key = corpus_key(f"{manager.embeddings.model_name}|{index_type}|dedup={DEDUP_THRESHOLD}", [file_hash(data) for _, data in files])
+        trace.count("upload_bytes", sum(len(data) for _, data in files))
+        if st.session_state.get("corpus_key") != key:
+            store = get_index_store()
+            if store.exists(key):
+                with trace.span("index_open"):
+                    manager.adopt(*open_shared_index(key))
+            else:
+                manager.sync(files, trace)
+                if manager.vector_store is not None:
+                    with trace.span("index_save"):
+                        info = {
+                            "embedding_backend": EMBEDDING_BACKEND,
+                            "embedding_model": manager.embeddings.model_name,
+                            "embedding_model_path": LOCAL_MODEL_PATH,
+                            "index_type": index_type,
+                            "dedup_threshold": DEDUP_THRESHOLD,
+                        }
+                        store.save(key, manager.vector_store, manager.files, manager.bm25, manager.dedup, info)
+                st.success(TEXT[language]["embedding_success"])
+                duplicates = trace.counts.get("duplicate_chunks", 0)
+                if duplicates:
+                    total = duplicates + trace.counts.get("embedded_chunks", 0)
+                    st.caption(f"🧬 Merged {duplicates} near-duplicate chunks: {duplicates / total:.0%} fewer vectors to embed and index.")
+            st.session_state.corpus_key = key
+        st.session_state.vector_store = manager.vector_store
+        trace.count("index_chunks", len(manager))
     except Exception as e:
         st.error(f"{TEXT[language]['embedding_error']} {e}")
+        trace.attrs["error"] = str(e)
+        get_trace_log().write(trace)
         st.stop()
 
+def render_trace(record):
+    with st.expander("🐞 Latency trace", expanded=True):
+        st.caption(f"Trace `{record['id']}` · {record['total']:.2f}s wall clock · logged to `{TRACE_FILE}`")
+        # busy = summed span time (exceeds wall when workers run in parallel)
+        st.dataframe(stage_summary(record["spans"]), use_container_width=True, hide_index=True)
+        st.json(record["counts"])
+
 # ------------------------------
 # Session State
 # ------------------------------
@@ -294,34 +440,85 @@ if st.button("🎙️ Speak Your Question"):
 # 🔍 Search & TTS
 # ------------------------------
 if st.button(TEXT[language]["search"]):
+    # Wall-clock spans for this click, from reading the uploads to the last TTS segment
+    trace = Trace("search", language=language, index_type=index_type, retrieval_mode=retrieval_mode)
     if uploaded_files:
-        create_vector_embeddings()
+        create_vector_embeddings(trace)
         if st.session_state.user_prompt:
             try:
                 with st.spinner("🔎 Searching and generating response..."):
-                    document_chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
-                    retriever = st.session_state.vector_store.as_retriever()
-                    retriever_chain = create_retrieval_chain(retriever, document_chain)
-
-                    start = time.process_time()
-                    response = retriever_chain.invoke({"input": st.session_state.user_prompt})
-                    elapsed = time.process_time() - start
+                    question = st.session_state.user_prompt
+                    answer_cache = get_answer_cache()
+                    # Answers depend on the indexed papers and on how we retrieve/generate
+                    cache_scope = (
+                        f"{st.session_state.corpus_key}|{retrieval_mode}|{RETRIEVAL_K}|{RETRIEVAL_FETCH_K}|{mmr_lambda}"
+                        f"|{CONTEXT_TOKEN_BUDGET}|{temperature}"
+                    )
+
+                    trace.attrs["question"] = question
+                    answer_start = trace.now()
+                    st.markdown(f"<h2>{TEXT[language]['response']}</h2>", unsafe_allow_html=True)
+                    card = st.empty()
+                    # Sentences are synthesised in the background while the answer is still streaming
+                    speech = SentenceTTSPipeline("en" if language == "English" else "hi", get_tts_service())
+
+                    with trace.span("embed_query"):
+                        question_vector = st.session_state.embeddings.embed_query(question)
+                    with trace.span("answer_cache"):
+                        cached = answer_cache.lookup(cache_scope, question, question_vector)
+                    trace.attrs["cache_hit"] = bool(cached)
+                    if cached:
+                        answer_text = cached["answer"]
+                        context_docs = cached["context"]
+                        speech.feed(answer_text)
+                    else:
+                        retriever = build_retriever(
+                            st.session_state.vector_store,
+                            st.session_state.index_manager.bm25,
+                            retrieval_mode,
+                            k=RETRIEVAL_K,
+                            count_tokens=get_token_counter(),
+                            budget=CONTEXT_TOKEN_BUDGET,
+                            fetch_k=RETRIEVAL_FETCH_K,
+                            mmr_lambda=mmr_lambda,
+                        )
+
+                        answer_text, context_docs = "", []
+                        for chunk in stream_answer(llm, retriever, question, trace):
+                            if "context" in chunk:
+                                context_docs = chunk["context"]
+                            token = chunk.get("answer")
+                            if token:
+                                answer_text += token
+                                speech.feed(token)
+                                card.markdown(f"<div class='response-card'>{answer_text}▌</div>", unsafe_allow_html=True)
+                        if answer_text:
+                            answer_cache.store(cache_scope, question, question_vector, answer_text, context_docs)
+                    elapsed = trace.now() - answer_start
+
+                    count_tokens = get_token_counter()
+                    trace.count("context_docs", len(context_docs))
+                    trace.count("context_tokens", sum(count_tokens(doc.page_content) for doc in context_docs))
+                    trace.count("question_tokens", count_tokens(question))
+                    trace.count("answer_tokens", count_tokens(answer_text))
 
                     # Response Card
-                    answer_text = response.get('answer') or response.get('output') or response.get('result') or '🤖 No response generated.'
-                    st.markdown(f"<h2>{TEXT[language]['response']}</h2>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='response-card'>{answer_text}</div>", unsafe_allow_html=True)
+                    answer_text = answer_text or '🤖 No response generated.'
+                    card.markdown(f"<div class='response-card'>{answer_text}</div>", unsafe_allow_html=True)
                     st.caption(f"⏱️ Response time: {elapsed:.2f} seconds")
+                    if cached:
+                        st.caption(f"⚡ Answered from cache (similar to: “{cached['question']}”, similarity {cached['similarity']:.2f})")
 
                     st.session_state.last_answer = answer_text
 
                     # TTS
-                    tts = gTTS(answer_text, lang="en" if language=="English" else "hi")
-                    audio_bytes_io = BytesIO()
-                    tts.write_to_fp(audio_bytes_io)
-                    audio_bytes_io.seek(0)
-                    b64 = base64.b64encode(audio_bytes_io.read()).decode()
-                    st.markdown(f"<audio autoplay style='display:none;'><source src='data:audio/mp3;base64,{b64}' type='audio/mp3'></audio>", unsafe_allow_html=True)
+                    # Only the wait after the answer is done; earlier sentences were synthesised during streaming
+                    with trace.span("tts"):
+                        audio_bytes = speech.finish()
+                    trace.count("audio_bytes", len(audio_bytes))
+                    if audio_bytes:
+                        # Served by Streamlit's media endpoint rather than inlined as base64 in the page
+                        st.audio(audio_bytes, format="audio/mp3", autoplay=True)
 
                     # Chat History
                     st.session_state.chat_history.append({
@@ -332,21 +529,25 @@ if st.button(TEXT[language]["search"]):
 
                     # Similarity Docs
                     with st.expander(TEXT[language]["similarity"]):
-                        context_docs = response.get("context", [])
                         if context_docs:
                             for i, doc in enumerate(context_docs):
-                                st.markdown(f"**Document {i+1}:**")
+                                st.markdown(f"**Document {i+1}:** _{format_sources(doc.metadata)}_")
                                 st.write(doc.page_content)
                                 st.markdown("---")
                         else:
                             st.info("📄 No relevant documents found. Answering from general knowledge.")
             except Exception as e:
                 st.error(f"{TEXT[language]['retrieval_error']} {e}")
+                trace.attrs["error"] = str(e)
         else:
             st.warning(TEXT[language]["query_warning"])
     else:
         st.warning(TEXT[language]["upload_warning"])
 
+    record = get_trace_log().write(trace)
+    if show_trace:
+        render_trace(record)
+
 # ------------------------------
 # 🗂️ Sidebar Chat History
 # ------------------------------
@@ -364,6 +565,28 @@ with st.sidebar:
         st.session_state.chat_history = []
         st.success("✅ Chat history cleared.")
 
+    answer_cache = get_answer_cache()
+    st.caption(
+        f"⚡ Answer cache: {len(answer_cache)} entries · "
+        f"{answer_cache.hits} hits / {answer_cache.misses} misses ({answer_cache.hit_rate:.0%} hit rate)"
+    )
+
+    if show_trace:
+        st.markdown("### 🐞 Recent traces")
+        recent = get_trace_log().recent(10)
+        if recent:
+            st.dataframe([
+                {
+                    "time": datetime.fromtimestamp(record["started_at"]).strftime("%H:%M:%S"),
+                    "total (s)": record["total"],
+                    "cached": record.get("cache_hit", False),
+                    "chunks": record["counts"].get("chunks", 0),
+                }
+                for record in reversed(recent)
+            ], hide_index=True)
+        else:
+            st.info("No traces yet.")
+
 # ------------------------------
 # 🧾 Footer
 # ------------------------------
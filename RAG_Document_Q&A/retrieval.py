@@ -0,0 +1,279 @@
+import re
+from typing import Any
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+# ------------------------------
+# 🔤 BM25 inverted index
+# ------------------------------
+class BM25Index:
+    """Inverted index over chunk texts, scored with Okapi BM25 in NumPy.
+
+    Rows are addressed by docstore id so the index can follow the FAISS store
+    through incremental adds and deletes. Deleted rows are masked out and
+    compacted away once they make up half the index.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []              # row -> docstore id
+        self.rows = {}             # docstore id -> row
+        self.lengths = []          # row -> token count
+        self.alive = []            # row -> still in the store
+        self.postings = {}         # term -> ([rows], [term frequencies])
+        self._arrays = {}          # term -> (rows ndarray, tf ndarray), rebuilt lazily
+        self._dirty = True
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.ids) - self.dead
+
+    def add(self, ids, texts):
+        for doc_id, text in zip(ids, texts):
+            row = len(self.ids)
+            self.ids.append(doc_id)
+            self.rows[doc_id] = row
+            tokens = tokenize(text)
+            self.lengths.append(len(tokens))
+            self.alive.append(True)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                rows, tfs = self.postings.setdefault(token, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+                self._arrays.pop(token, None)
+        self._dirty = True
+
+    def remove(self, ids):
+        for doc_id in ids:
+            row = self.rows.pop(doc_id, None)
+            if row is not None and self.alive[row]:
+                self.alive[row] = False
+                self.dead += 1
+        self._dirty = True
+        if self.dead and self.dead * 2 >= len(self.ids):
+            self._compact()
+
+    def _compact(self):
+        alive = np.asarray(self.alive, dtype=bool)
+        new_row = np.cumsum(alive) - 1
+        postings = {}
+        for term, (rows, tfs) in self.postings.items():
+            rows = np.asarray(rows)
+            keep = alive[rows]
+            if keep.any():
+                postings[term] = (new_row[rows[keep]].tolist(), np.asarray(tfs)[keep].tolist())
+        self.postings = postings
+        self.ids = [doc_id for doc_id, live in zip(self.ids, self.alive) if live]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.lengths = [length for length, live in zip(self.lengths, self.alive) if live]
+        self.alive = [True] * len(self.ids)
+        self._arrays = {}
+        self.dead = 0
+        self._dirty = True
+
+    def _refresh(self):
+        if self._dirty:
+            self._alive_arr = np.asarray(self.alive, dtype=bool)
+            self._len_arr = np.asarray(self.lengths, dtype=np.float32)
+            live_lengths = self._len_arr[self._alive_arr]
+            self._avgdl = float(live_lengths.mean()) if len(live_lengths) else 1.0
+            self._dirty = False
+
+    def _term_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            rows, tfs = self.postings[term]
+            arrays = (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def scores(self, query):
+        """BM25 score of every row for ``query`` (dead rows score -inf)."""
+        self._refresh()
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n_docs = len(self)
+        norm = self.k1 * (1 - self.b + self.b * self._len_arr / self._avgdl)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self._term_arrays(term)
+            df = int(self._alive_arr[rows].sum())
+            if df == 0:
+                continue
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            # rows are unique within one posting list, so fancy-index += is safe
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+        scores[~self._alive_arr] = -np.inf
+        return scores
+
+    def search(self, query, k):
+        """Top ``k`` ``(docstore id, score)`` pairs with a positive score."""
+        if not self.ids or k <= 0:
+            return []
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[row], float(scores[row])) for row in top if scores[row] > 0]
+
+    @classmethod
+    def from_docstore(cls, docstore, index_to_docstore_id):
+        bm25 = cls()
+        ids = [doc_id for _, doc_id in sorted(index_to_docstore_id.items())]
+        bm25.add(ids, [docstore.search(doc_id).page_content for doc_id in ids])
+        return bm25
+
+
+# ------------------------------
+# 🔀 Hybrid retriever (reciprocal-rank fusion)
+# ------------------------------
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Fuse ranked id lists: score(id) = sum 1 / (rrf_k + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+def _unit(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def _query_matrix(vector_store, vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return _unit(matrix) if getattr(vector_store, "_normalize_L2", False) else matrix
+
+
+def dense_search_batch(vector_store, vectors, k):
+    """Docstore ids of the top ``k`` chunks for every row of ``vectors``, in one FAISS search call."""
+    _, rows = vector_store.index.search(_query_matrix(vector_store, vectors), k)
+    mapping = vector_store.index_to_docstore_id
+    return [[mapping[row] for row in hits if row != -1] for hits in rows]
+
+
+def fuse_with_bm25(dense_ids, bm25, query, k, fetch_k=20, rrf_k=60):
+    """RRF of precomputed dense ids with BM25 hits for ``query``; the batch counterpart of ``HybridRetriever``."""
+    sparse = [doc_id for doc_id, _ in bm25.search(query, fetch_k)]
+    return reciprocal_rank_fusion([dense_ids, sparse], rrf_k)[:k]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense FAISS search and BM25 keyword search merged with reciprocal-rank fusion."""
+
+    vector_store: Any
+    bm25: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        dense = self.vector_store.similarity_search(query, k=self.fetch_k)
+        docs = {doc.id: doc for doc in dense if doc.id}
+        sparse = [doc_id for doc_id, _ in self.bm25.search(query, self.fetch_k)]
+        fused = reciprocal_rank_fusion([list(docs), sparse], self.rrf_k)[: self.k]
+        results = []
+        for doc_id in fused:
+            doc = docs.get(doc_id) or self.vector_store.docstore.search(doc_id)
+            if doc is not None and not isinstance(doc, str):
+                results.append(doc)
+        return results
+
+
+# ------------------------------
+# 🎯 Maximal marginal relevance (vectorised)
+# ------------------------------
+MMR_BATCH_FLOATS = 1 << 24  # candidate vectors held at once by mmr_search_batch (64 MB of float32)
+
+
+def mmr_select(query_vectors, candidates, k, lambda_mult=0.5, valid=None):
+    """Greedy MMR for a batch of queries: ``b x k`` candidate indices (-1 pads short lists).
+
+    ``query_vectors`` is ``b x d``, ``candidates`` ``b x n x d`` and ``valid`` an
+    optional ``b x n`` mask. Each step scores every candidate of every query at
+    once as ``lambda * cos(query) - (1 - lambda) * max cos(already picked)``;
+    the running max is updated with one ``b x n`` product per pick, so a step
+    costs O(b n d) and the n x n similarity matrix is never built.
+    """
+    queries = _unit(np.asarray(query_vectors, dtype=np.float32))
+    candidates = _unit(np.asarray(candidates, dtype=np.float32))
+    b, n = candidates.shape[:2]
+    available = np.ones((b, n), dtype=bool) if valid is None else np.array(valid, dtype=bool)
+    relevance = np.einsum("bnd,bd->bn", candidates, queries)
+    redundancy = np.zeros((b, n), dtype=np.float32)
+    picks = np.full((b, k), -1, dtype=np.int64)
+    rows = np.arange(b)
+    for step in range(min(k, n)):
+        # The first pick is the most relevant candidate; later ones trade relevance for novelty
+        scores = relevance if step == 0 else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        pick = np.where(available, scores, -np.inf).argmax(axis=1)
+        ok = available[rows, pick]
+        if not ok.any():
+            break
+        picks[ok, step] = pick[ok]
+        available[rows, pick] = False
+        similarity = np.einsum("bnd,bd->bn", candidates, candidates[rows, pick])
+        redundancy = similarity if step == 0 else np.maximum(redundancy, similarity)
+    return picks
+
+
+def mmr_search_batch(vector_store, vectors, k, fetch_k=20, lambda_mult=0.5):
+    """Docstore ids of ``k`` diverse chunks per row of ``vectors``, chosen by MMR among the top ``fetch_k``.
+
+    Candidates and their stored vectors come back from one FAISS
+    ``search_and_reconstruct`` call per slice of queries, so nothing is
+    re-embedded and there is no per-row ``reconstruct`` loop.
+    """
+    matrix = _query_matrix(vector_store, vectors)
+    fetch_k = max(fetch_k, k)
+    mapping = vector_store.index_to_docstore_id
+    step = max(1, MMR_BATCH_FLOATS // (fetch_k * vector_store.index.d))
+    results = []
+    for start in range(0, len(matrix), step):
+        queries = matrix[start:start + step]
+        _, labels, recons = vector_store.index.search_and_reconstruct(queries, fetch_k)
+        picks = mmr_select(queries, recons, k, lambda_mult, valid=labels != -1)
+        results.extend(
+            [mapping[int(labels[i, j])] for j in row if j != -1]
+            for i, row in enumerate(picks)
+        )
+    return results
+
+
+class MMRRetriever(BaseRetriever):
+    """Dense FAISS search re-ranked with maximal marginal relevance.
+
+    Keeps the ``k`` chunks that best balance similarity to the question
+    against similarity to chunks already picked, so overlapping slices of
+    one paragraph don't fill the context. ``lambda_mult`` 1 is plain top-k,
+    0 is maximum diversity.
+    """
+
+    vector_store: Any
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        if self.vector_store.index.ntotal == 0:
+            return []
+        vector = self.vector_store._embed_query(query)
+        ids = mmr_search_batch(self.vector_store, [vector], self.k, self.fetch_k, self.lambda_mult)[0]
+        results = []
+        for doc_id in ids:
+            doc = self.vector_store.docstore.search(doc_id)
+            if doc is not None and not isinstance(doc, str):
+                results.append(doc)
+        return results
@@ -0,0 +1,236 @@
+"""Offline stand-ins for the hosted services used by the RAG app.
+
+Run ``python stubs.py --port 8765`` and point the app at it with
+``OPENAI_BASE_URL=http://127.0.0.1:8765/v1`` to exercise ingestion without an
+OpenAI key. Its embeddings come from ``embedding_backends.hash_embedding``.
+``stub_chat_model`` and ``make_pdf`` are used in-process by ``benchmark.py pipeline``.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from embedding_backends import hash_embedding
+
+
+# ------------------------------
+# 🤖 Canned-response chat model
+# ------------------------------
+STUB_ANSWER = (
+    "Based on the provided context, the paper proposes a retrieval method and evaluates it on several benchmarks. "
+    "The results improve over the baselines. I don't know any further details."
+)
+
+
+def stub_chat_model(responses=None, sleep=None):
+    """A chat model that streams ``responses`` in turn, character by character.
+
+    ``sleep`` (seconds per streamed chunk) mimics generation speed.
+    """
+    return FakeListChatModel(responses=responses or [STUB_ANSWER], sleep=sleep)
+
+
+# ------------------------------
+# 📄 Synthetic PDF corpus
+# ------------------------------
+_VOCABULARY = (
+    "attention transformer encoder decoder retrieval embedding vector index query document "
+    "corpus benchmark baseline ablation dataset training inference latency throughput memory "
+    "gradient optimizer layer token context model accuracy recall precision evaluation method "
+    "result table figure section experiment parameter network graph sparse dense hybrid score"
+).split()
+
+
+def synthetic_page(rng, lines=40, words_per_line=12):
+    """Random lines drawn from a small ML vocabulary, so BM25 and hashing have overlap to find."""
+    return [" ".join(rng.choice(_VOCABULARY) for _ in range(words_per_line)) for _ in range(lines)]
+
+
+def synthetic_query(rng, words=6):
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Minimal single-font PDF: ``pages`` is a list of pages, each a list of text lines."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = "".join(f"({_pdf_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td {body}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
+
+
+def revise_page(rng, lines, edit_rate=0.01):
+    """A "v2" of a page: each word is replaced with probability ``edit_rate``."""
+    return [
+        " ".join(rng.choice(_VOCABULARY) if rng.random() < edit_rate else word for word in line.split())
+        for line in lines
+    ]
+
+
+def versioned_corpus(papers, pages_per_paper=10, edit_rate=0.01, seed=0):
+    """Each paper as ``_v1.pdf`` and a lightly edited ``_v2.pdf``, like arXiv revisions."""
+    rng = random.Random(seed)
+    files = []
+    for number in range(papers):
+        pages = [synthetic_page(rng) for _ in range(pages_per_paper)]
+        files.append((f"paper_{number:05d}_v1.pdf", make_pdf(pages)))
+        files.append((f"paper_{number:05d}_v2.pdf", make_pdf([revise_page(rng, page, edit_rate) for page in pages])))
+    return files
+
+
+def synthetic_corpus(pages, pages_per_file=50, seed=0):
+    """``[(name, pdf bytes), ...]`` holding ``pages`` generated pages in total."""
+    rng = random.Random(seed)
+    files = []
+    for start in range(0, pages, pages_per_file):
+        count = min(pages_per_file, pages - start)
+        files.append((f"paper_{len(files):05d}.pdf", make_pdf([synthetic_page(rng) for _ in range(count)])))
+    return files
+
+
+# ------------------------------
+# 🔊 Offline text-to-speech stand-in
+# ------------------------------
+def stub_synthesize(text, lang, seconds_per_char=0.0):
+    """Deterministic fake "MP3" bytes for ``text`` (not playable), optionally slowed down
+    to mimic gTTS network latency."""
+    if seconds_per_char:
+        time.sleep(seconds_per_char * len(text))
+    return b"STUBMP3" + hashlib.sha256(f"{lang}:{text}".encode("utf-8")).digest()
+
+
+# ------------------------------
+# 🌐 Stub OpenAI-compatible /embeddings server
+# ------------------------------
+class StubEmbeddingServer:
+    """Serves ``POST /v1/embeddings`` on localhost.
+
+    ``throttle_every`` answers every n-th request with 429 and a
+    ``retry-after-ms`` header, and ``latency`` adds a fixed delay per request,
+    so client batching and backoff can be checked without a real provider.
+    """
+
+    def __init__(self, port=0, dim=256, latency=0.0, throttle_every=0, retry_after_ms=50):
+        self.dim = dim
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after_ms = retry_after_ms
+        self.requests = 0
+        self.throttled = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v1/embeddings":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                    throttle = server.throttle_every and server.requests % server.throttle_every == 0
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if throttle:
+                        with server._lock:
+                            server.throttled += 1
+                        self.send_response(429)
+                        self.send_header("retry-after-ms", str(server.retry_after_ms))
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    inputs = body["input"]
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    payload = json.dumps({
+                        "object": "list",
+                        "model": body.get("model"),
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": hash_embedding(text, server.dim)}
+                            for i, text in enumerate(inputs)
+                        ],
+                    }).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub embedding server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--throttle-every", type=int, default=0, help="reply 429 to every n-th request")
+    args = parser.parse_args()
+    stub = StubEmbeddingServer(args.port, args.dim, args.latency, args.throttle_every)
+    print(f"Stub embeddings at {stub.base_url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+
+# ------------------------------
+# ⏱️ Wall-clock spans for one request
+# ------------------------------
+class Trace:
+    """Wall-clock spans and counters for one search (ingest + retrieval + answer).
+
+    Span ``start`` is seconds since the trace began. A stage may appear many
+    times (e.g. one ``embed`` span per batch, one ``parse`` span per worker
+    task), and spans from parallel workers overlap; ``stage_summary`` folds
+    them into busy and wall time per stage.
+    """
+
+    def __init__(self, kind, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Seconds since the trace started."""
+        return time.perf_counter() - self._t0
+
+    def add_span(self, name, start, duration, **attrs):
+        with self._lock:
+            self.spans.append({"name": name, "start": round(start, 6), "duration": round(duration, 6), **attrs})
+
+    def add_epoch_span(self, name, started_at, duration, **attrs):
+        """Record a span timed with ``time.time()``, e.g. inside a worker process."""
+        self.add_span(name, started_at - self.started_at, duration, **attrs)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, self.now() - start, **attrs)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "started_at": self.started_at,
+                "total": round(self.now(), 6),
+                **self.attrs,
+                "spans": list(self.spans),
+                "counts": dict(self.counts),
+            }
+
+
+class _NullTrace:
+    """Stand-in used when nothing is being traced; every method is a no-op."""
+
+    def now(self):
+        return 0.0
+
+    def add_span(self, *args, **kwargs):
+        pass
+
+    def add_epoch_span(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def span(self, *args, **kwargs):
+        yield
+
+    def count(self, *args, **kwargs):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def stage_summary(spans):
+    """Per stage: number of spans, summed ``busy`` time, and ``wall`` time from first start to last end."""
+    stages = {}
+    for span in spans:
+        end = span["start"] + span["duration"]
+        stage = stages.setdefault(span["name"], {"stage": span["name"], "calls": 0, "busy": 0.0, "_first": span["start"], "_last": end})
+        stage["calls"] += 1
+        stage["busy"] += span["duration"]
+        stage["_first"] = min(stage["_first"], span["start"])
+        stage["_last"] = max(stage["_last"], end)
+    rows = []
+    for stage in sorted(stages.values(), key=lambda s: s["_first"]):
+        rows.append({
+            "stage": stage["stage"],
+            "calls": stage["calls"],
+            "start": round(stage["_first"], 3),
+            "wall": round(stage["_last"] - stage["_first"], 3),
+            "busy": round(stage["busy"], 3),
+        })
+    return rows
+
+
+# ------------------------------
+# 📝 JSONL trace log
+# ------------------------------
+class TraceLog:
+    """Appends finished traces to a JSONL file, one object per line. Thread-safe."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, trace):
+        record = trace.to_dict() if isinstance(trace, Trace) else trace
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return record
+
+    def recent(self, n=20):
+        """The last ``n`` traces, oldest first."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = deque(f, maxlen=n)
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # a line cut short by a crash
+        return records
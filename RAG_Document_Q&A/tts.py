@@ -0,0 +1,142 @@
+import hashlib
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from gtts import gTTS
+
+# End of a sentence: . ! ? or the Devanagari danda, followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+def gtts_synthesize(text, lang):
+    buffer = BytesIO()
+    gTTS(text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+def split_sentences(buffer):
+    """Split ``buffer`` into complete sentences and the unfinished remainder."""
+    parts = _SENTENCE_END.split(buffer)
+    return [p for p in parts[:-1] if p.strip()], parts[-1]
+
+
+# ------------------------------
+# 🗄️ Audio cache
+# ------------------------------
+class AudioCache:
+    """MP3 files keyed by ``sha256(lang + text)``, bounded to ``max_bytes`` (LRU by mtime)."""
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, text, lang):
+        digest = hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}.mp3")
+
+    def get(self, text, lang):
+        path = self._path(text, lang)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted by another session after the read; the bytes are still good
+        return data
+
+    def put(self, text, lang, data):
+        path = self._path(text, lang)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".mp3"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+# ------------------------------
+# 🧵 Shared synthesis workers
+# ------------------------------
+class TTSService:
+    """Runs ``synthesize(text, lang) -> mp3 bytes`` on a worker pool, behind an optional cache.
+
+    One instance is meant to be shared by all sessions (``st.cache_resource``).
+    """
+
+    def __init__(self, synthesize=gtts_synthesize, cache=None, workers=4):
+        self.synthesize = synthesize
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+
+    def _run(self, text, lang):
+        data = self.synthesize(text, lang)
+        if self.cache is not None:
+            self.cache.put(text, lang, data)
+        return data
+
+    def submit(self, text, lang):
+        if self.cache is not None:
+            data = self.cache.get(text, lang)
+            if data is not None:
+                future = Future()
+                future.set_result(data)
+                return future
+        return self._pool.submit(self._run, text, lang)
+
+
+# ------------------------------
+# 🔊 Sentence-pipelined TTS
+# ------------------------------
+class SentenceTTSPipeline:
+    """Feeds streamed answer text to the TTS service one sentence at a time.
+
+    Each finished sentence is synthesised while the model is still generating
+    the next ones. ``finish()`` flushes the last partial sentence and returns
+    the MP3 segments joined in order (MP3 frames concatenate cleanly).
+    """
+
+    def __init__(self, lang, service):
+        self.lang = lang
+        self.service = service
+        self._futures = []
+        self._buffer = ""
+
+    def _submit(self, sentence):
+        self._futures.append(self.service.submit(sentence.strip(), self.lang))
+
+    def feed(self, text):
+        self._buffer += text
+        sentences, self._buffer = split_sentences(self._buffer)
+        for sentence in sentences:
+            self._submit(sentence)
+
+    def finish(self):
+        if self._buffer.strip():
+            self._submit(self._buffer)
+        self._buffer = ""
+        return b"".join(future.result() for future in self._futures)